@@ -0,0 +1,106 @@
+# WWII Pacific Front - benchmarks/startup.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Cold start benchmark: how long importing the game and getting the first frame on screen
+takes, plus an `-X importtime` breakdown of what gets imported on the way.
+
+Every measurement runs in a fresh interpreter, so nothing is cached between runs.
+```sh
+python benchmarks/startup.py
+python benchmarks/startup.py --scene demo_board --runs 10
+```
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+FIRST_FRAME_SNIPPET = '''
+import time
+t0 = time.perf_counter()
+import pygame
+from game import gamemodels
+t1 = time.perf_counter()
+pygame.init()
+gameloop = gamemodels.GameLoop({scene!r}, (800, 600))
+gameloop.step(pygame.event.get())
+t2 = time.perf_counter()
+print(json.dumps({{'import': t1 - t0, 'first_frame': t2 - t0}}))
+'''
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env.setdefault('SDL_VIDEODRIVER', 'dummy')
+    env.setdefault('SDL_AUDIODRIVER', 'dummy')
+    env['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+    return subprocess.run(
+        [sys.executable, *flags, '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def import_times(module: str):
+    '''
+    Returns `(self_us, cumulative_us, name)` for every module `-X importtime` reports.
+    '''
+    proc = run_python(f'import {module}', '-X', 'importtime')
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def nested_imports(rows, module: str):
+    '''
+    The rows for what `module` imports directly. importtime lists a module after everything
+    it imports, each nesting level indented by two more spaces.
+    '''
+    def indent(row) -> int:
+        return len(row[2]) - len(row[2].lstrip())
+
+    end = next(i for i, row in enumerate(rows) if row[2].strip() == module)
+    depth = indent(rows[end])
+    direct = []
+    for row in reversed(rows[:end]):
+        if indent(row) <= depth:
+            break
+        if indent(row) == depth + 2:
+            direct.append(row)
+    return direct
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scene', default='menu_main')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    snippet = 'import json\n' + FIRST_FRAME_SNIPPET.format(scene=args.scene)
+    results = [json.loads(run_python(snippet).stdout) for _ in range(args.runs)]
+    import_ms = statistics.median(r['import'] for r in results) * 1000
+    first_frame_ms = statistics.median(r['first_frame'] for r in results) * 1000
+    print(f'Time to first frame ({args.scene}, median of {args.runs} runs):')
+    print(f'  import game.gamemodels  {import_ms:8.1f} ms')
+    print(f'  first frame presented   {first_frame_ms:8.1f} ms')
+
+    rows = import_times('game.gamemodels')
+    direct = nested_imports(rows, 'game.gamemodels')
+    print('\nImports made by game.gamemodels, by cumulative time (-X importtime):')
+    for self_us, cumulative_us, name in sorted(direct, key=lambda r: -r[1])[:args.top]:
+        print(f'  {cumulative_us / 1000:8.1f} ms  {name.strip()}')
+    print(f'\n{len(rows)} modules imported')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+# WWII Pacific Front - audio.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Music and sound for `GameLoop`.
+
+`MusicPlayer` streams the tracks in `assets/mus` with `pygame.mixer.music`, so a track is
+never decoded up front, and keeps the next track queued so one follows the other without a
+gap. Volume and the current track come from `GameOptions`.
+
+`SoundBank` decodes every sound effect once, up front, and plays them on a fixed pool of
+reserved mixer channels, so firing a salvo never loads, decodes or allocates anything.
+
+If the mixer couldn't be initialized (no audio device), everything here quietly does nothing.
+'''
+
+from array import array
+import io
+from math import pi, sin
+from pathlib import Path
+import random
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Final, List, Optional, Sequence, Tuple
+
+import pygame
+import pygame.mixer
+
+if TYPE_CHECKING:
+    from .config import GameOptions
+
+ASSET_DIR = Path(__file__).parent.parent / 'assets'
+
+# Effect name: priority. Higher priority sounds may cut off lower ones when every channel is busy
+SOUND_EFFECTS: Final[Dict[str, int]] = {
+    'miss': 0,
+    'hit': 1,
+    'sink': 2,
+}
+
+
+class MusicPlayer:
+    '''
+    Plays `tracks` in a loop, starting from the `music_sounds.track` option (1-based).
+
+    `switch()` fades the current track out and the new one in, with the volume ramped by
+    `update(dt)` from the frame clock. `pygame.mixer.music` only has one stream, so the two
+    halves of the fade happen one after the other rather than overlapping.
+
+    Track files are read into memory on a background thread, and only opened (from memory)
+    on the main thread once they're in, so starting, switching or queueing a track never
+    waits on the disk. A track starts on the first `update()` after its file is read.
+
+    Option changes (from the options menu or a hot reload) may arrive on another thread;
+    they're only recorded there and applied by the next `update()`.
+    '''
+    def __init__(
+        self,
+        options: 'GameOptions',
+        tracks: Optional[Sequence[Path]]=None,
+        fade: float=1.0
+    ) -> None:
+        self.tracks: List[Path] = list(tracks) if tracks is not None else sorted(
+            (ASSET_DIR / 'mus').glob('*.ogg')
+        )
+        self.fade = fade
+        self.enabled = pygame.mixer.get_init() is not None and bool(self.tracks)
+        self.index = -1
+        self.end_event = pygame.event.custom_type()
+        self.volume = options['music_sounds.music_volume'] / 100
+        self._ramp = 1.0
+        self._ramp_speed = 0.0
+        self._next: Optional[int] = None # track to start once it's read (and faded out to)
+        self._queued: Optional[int] = None # track to queue once it's read
+        self._reads: Dict[int, Tuple[threading.Thread, List[bytes]]] = {}
+        # pygame streams from these, so they're kept alive while in use
+        self._sources: List[io.BytesIO] = []
+        self._pending_track: Optional[int] = None
+        self._volume_changed = True
+        options.subscribe('music_sounds.music_volume', self._on_volume)
+        options.subscribe('music_sounds.track', self._on_track)
+        self._start_index = (options['music_sounds.track'] - 1) % max(len(self.tracks), 1)
+
+    @property
+    def fading(self) -> bool:
+        '''
+        Whether a fade or a track start is in progress (so `update()` has work to do).
+        '''
+        return self._ramp_speed != 0.0 or self._next is not None
+
+    def _on_volume(self, key: str, value: Any) -> None:
+        self.volume = value / 100
+        self._volume_changed = True
+
+    def _on_track(self, key: str, value: Any) -> None:
+        self._pending_track = value - 1
+
+    def play(self, index: Optional[int]=None) -> None:
+        '''
+        Starts playing track `index` (no fade) as soon as it's read, and queues the one
+        after it.
+        '''
+        if not self.enabled:
+            return
+        self._ramp = 1.0
+        self._ramp_speed = 0.0
+        self._next = (index if index is not None else self._start_index) % len(self.tracks)
+        self._read(self._next)
+
+    def _read(self, index: int) -> None:
+        if index in self._reads:
+            return
+        data: List[bytes] = []
+        thread = threading.Thread(
+            target=lambda: data.append(self.tracks[index].read_bytes()),
+            name='MusicPlayer read', daemon=True
+        )
+        thread.start()
+        self._reads[index] = (thread, data)
+
+    def _take(self, index: int) -> Optional[io.BytesIO]:
+        # The track's file, if it has been read
+        read = self._reads.get(index)
+        if read is None or read[0].is_alive():
+            return None
+        del self._reads[index]
+        if not read[1]:
+            # Reading failed; the thread has already reported why
+            return None
+        return io.BytesIO(read[1][0])
+
+    def _start(self, index: int, source: io.BytesIO) -> None:
+        self.index = index
+        # Stopping the old track would post the end event as well, so it's off while loading
+        pygame.mixer.music.set_endevent()
+        pygame.mixer.music.load(source, self.tracks[index].suffix[1:])
+        self._sources = [source]
+        pygame.mixer.music.set_volume(self.volume * self._ramp)
+        # With one track, looping it is gapless already
+        pygame.mixer.music.play(loops=-1 if len(self.tracks) == 1 else 0)
+        pygame.mixer.music.set_endevent(self.end_event)
+        self._queue_next()
+
+    def _queue_next(self) -> None:
+        if len(self.tracks) > 1:
+            self._queued = (self.index + 1) % len(self.tracks)
+            self._read(self._queued)
+
+    def switch(self, index: int, fade: Optional[float]=None) -> None:
+        '''
+        Fades over to track `index`. Does nothing if it's already playing.
+        '''
+        if not self.enabled:
+            return
+        index %= len(self.tracks)
+        if index == self.index and self._next is None:
+            return
+        fade = self.fade if fade is None else fade
+        if fade <= 0 or not pygame.mixer.music.get_busy():
+            self.play(index)
+            return
+        self._next = index
+        self._read(index)
+        # Half the time fading out, half fading in
+        self._ramp_speed = -2 / fade
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        '''
+        Handles the end-of-track event. Returns whether `event` was one.
+        '''
+        if event.type != self.end_event:
+            return False
+        # The queued track has just started; queue the one after it
+        if self.enabled and self._next is None:
+            self.index = (self.index + 1) % len(self.tracks)
+            self._sources = self._sources[1:]
+            self._queue_next()
+        return True
+
+    def update(self, dt: float) -> None:
+        '''
+        Advances any fade by `dt` seconds and applies option changes.
+        '''
+        if not self.enabled:
+            return
+        if self._pending_track is not None:
+            self.switch(self._pending_track)
+            self._pending_track = None
+        if self._ramp_speed:
+            # Fading out holds at silence until the next track has been read
+            self._ramp = min(max(self._ramp + self._ramp_speed * dt, 0.0), 1.0)
+            if self._ramp == 1.0:
+                self._ramp_speed = 0.0
+            self._volume_changed = True
+        if self._next is not None and (self._ramp_speed >= 0 or self._ramp == 0.0):
+            source = self._take(self._next)
+            if source is not None:
+                self._start(self._next, source)
+            if self._next not in self._reads:
+                # Started, or couldn't be read (then whatever was playing carries on)
+                self._next = None
+                self._ramp_speed = abs(self._ramp_speed)
+        if self._queued is not None and self._next is None:
+            source = self._take(self._queued)
+            if source is not None:
+                pygame.mixer.music.queue(source, self.tracks[self._queued].suffix[1:])
+                self._sources.append(source)
+            if self._queued not in self._reads:
+                self._queued = None
+        if self._volume_changed:
+            pygame.mixer.music.set_volume(self.volume * self._ramp)
+            self._volume_changed = False
+
+    def stop(self) -> None:
+        if self.enabled:
+            self._next = None
+            self._queued = None
+            self._ramp_speed = 0.0
+            pygame.mixer.music.set_endevent()
+            pygame.mixer.music.stop()
+
+
+class SoundBank:
+    '''
+    Loads `assets/sfx/<name>.ogg` (or `.wav`) for each effect in `effects` and plays them
+    on `channels` reserved mixer channels.
+
+    When every channel is busy, `play()` takes over the channel playing the lowest priority
+    sound (the oldest one, among equals), unless that sound outranks the new one, in which case
+    the new sound is dropped.
+
+    Effects without a file get a short synthesized placeholder, so the game still has audio
+    feedback before real sounds are added.
+    '''
+    def __init__(
+        self,
+        options: 'GameOptions',
+        effects: Optional[Dict[str, int]]=None,
+        channels: int=8,
+        sfx_dir: Path=ASSET_DIR / 'sfx'
+    ) -> None:
+        self.priorities = dict(SOUND_EFFECTS if effects is None else effects)
+        self.enabled = pygame.mixer.get_init() is not None
+        self.volume = options['music_sounds.sound_volume'] / 100
+        options.subscribe('music_sounds.sound_volume', self._on_volume)
+        self.sounds: Dict[str, pygame.mixer.Sound] = {}
+        self.channels: List[pygame.mixer.Channel] = []
+        if not self.enabled:
+            return
+        for name in self.priorities:
+            self.sounds[name] = self._load(sfx_dir, name)
+        if pygame.mixer.get_num_channels() < channels * 2:
+            pygame.mixer.set_num_channels(channels * 2)
+        # Reserved channels are never picked by Sound.play(), so nothing else steals them
+        pygame.mixer.set_reserved(channels)
+        self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+        self._playing = [0] * channels
+        self._started = [0] * channels
+        self._plays = 0
+
+    def _on_volume(self, key: str, value: Any) -> None:
+        self.volume = value / 100
+
+    def _load(self, sfx_dir: Path, name: str) -> pygame.mixer.Sound:
+        for suffix in ('.ogg', '.wav'):
+            path = sfx_dir / (name + suffix)
+            if path.exists():
+                return pygame.mixer.Sound(path)
+        return synth_effect(name)
+
+    def play(self, name: str, priority: Optional[int]=None) -> Optional[pygame.mixer.Channel]:
+        '''
+        Plays effect `name` (at its default priority, unless given). Returns the channel it
+        plays on, or None if it was dropped.
+        '''
+        if not self.enabled:
+            return None
+        if priority is None:
+            priority = self.priorities[name]
+        victim = -1
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                victim = i
+                break
+            if victim < 0 or (self._playing[i], self._started[i]) < (
+                self._playing[victim], self._started[victim]
+            ):
+                victim = i
+        if self.channels[victim].get_busy() and self._playing[victim] > priority:
+            return None
+        channel = self.channels[victim]
+        channel.play(self.sounds[name])
+        channel.set_volume(self.volume)
+        self._plays += 1
+        self._playing[victim] = priority
+        self._started[victim] = self._plays
+        return channel
+
+    def stop(self) -> None:
+        for channel in self.channels:
+            channel.stop()
+
+
+# Mixer sample size: (array typecode, amplitude, offset of silence)
+_SAMPLE_FORMATS: Final[Dict[int, Tuple[str, float, int]]] = {
+    8: ('B', 127, 128),
+    -8: ('b', 127, 0),
+    16: ('H', 32767, 32768),
+    -16: ('h', 32767, 0),
+    32: ('f', 1.0, 0),
+    -32: ('i', 2**31 - 1, 0),
+}
+
+
+def synth_effect(name: str, duration: float=0.3) -> pygame.mixer.Sound:
+    '''
+    Builds a placeholder effect: a decaying thump for hits and sinks, a burst of noise for
+    anything else. Only used when an effect has no sound file.
+    '''
+    freq, size, channels = pygame.mixer.get_init()
+    typecode, scale, bias = _SAMPLE_FORMATS[size]
+    length = int(freq * duration)
+    rng = random.Random(name)
+    pitch = {'hit': 90, 'sink': 55}.get(name)
+    samples = array(typecode)
+    convert = float if typecode == 'f' else int
+    for i in range(length):
+        envelope = (1 - i / length) ** 2
+        if pitch is not None:
+            value = sin(2 * pi * pitch * i / freq) * 0.8 + rng.uniform(-0.2, 0.2)
+        else:
+            value = rng.uniform(-0.5, 0.5)
+        samples.extend([convert(value * envelope * scale + bias)] * channels)
+    return pygame.mixer.Sound(buffer=samples)
@@ -0,0 +1,164 @@
+# WWII Pacific Front - capture.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Gameplay recording for bug reports and regression comparisons.
+
+`FrameCapture` copies what `GameLoop` presents each frame (only the dirty rects, when the
+frame wasn't a full redraw) into a bounded queue, and a background thread pastes the copies
+onto its own canvas and encodes it. The main thread never waits for the encoder: when the
+queue is full the frame is dropped and counted, and the next frame is copied whole so the
+canvas stays correct.
+
+Start a capture with the F10 debug key, or at startup by setting these environment
+variables:
+
+- `WWII_CAPTURE`: `png` for a PNG per frame, or `raw` for one stream of raw RGB frames
+- `WWII_CAPTURE_DIR`: where to write the output (default: `captures`)
+- `WWII_CAPTURE_QUEUE`: how many frames can wait for the encoder (default: 8)
+
+PNGs are named by frame number, so dropped and idle (unchanged) frames show up as gaps.
+Raw streams get every frame, repeating the last one when nothing changed, and are named
+after their frame size; convert one with e.g.
+`ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x600 -r 60 -i frames_800x600.rgb out.mp4`.
+'''
+
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple, Union
+
+import pygame
+import pygame.image
+
+FORMATS = ('png', 'raw')
+
+# (frame number, frame size, [(copy of an area, its top left corner)])
+CapturedFrame = Tuple[int, Tuple[int, int], List[Tuple[pygame.Surface, Tuple[int, int]]]]
+
+
+class FrameCapture:
+    def __init__(
+        self,
+        fmt: str='png',
+        out_dir: Union[str, Path]='captures',
+        queue_size: int=8
+    ) -> None:
+        if fmt not in FORMATS:
+            raise ValueError(f'Unknown capture format {fmt!r} (expected one of {FORMATS})')
+        self.fmt = fmt
+        self.out_dir = Path(out_dir)
+        self.queue_size = queue_size
+        self.active = False
+        self.frames = 0
+        self.dropped = 0
+        self._queue: Optional['queue.Queue[Optional[CapturedFrame]]'] = None
+        self._thread: Optional[threading.Thread] = None
+        self._need_full = True
+        self._last_size: Optional[Tuple[int, int]] = None
+        self._dir = self.out_dir
+
+    @classmethod
+    def from_env(cls) -> 'FrameCapture':
+        '''
+        Builds a `FrameCapture` from the `WWII_CAPTURE*` environment variables, and starts it
+        right away if a format was given.
+        '''
+        fmt = os.environ.get('WWII_CAPTURE')
+        capture = cls(
+            fmt=fmt or 'png',
+            out_dir=os.environ.get('WWII_CAPTURE_DIR', 'captures'),
+            queue_size=int(os.environ.get('WWII_CAPTURE_QUEUE', 8)),
+        )
+        if fmt:
+            capture.start()
+        return capture
+
+    def start(self) -> None:
+        if self.active:
+            return
+        self._dir = self.out_dir / time.strftime('capture_%Y%m%d_%H%M%S')
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self.frames = 0
+        self.dropped = 0
+        self._need_full = True
+        self._queue = queue.Queue(self.queue_size)
+        self._thread = threading.Thread(target=self._encode, name='FrameCapture', daemon=True)
+        self._thread.start()
+        self.active = True
+
+    def toggle(self) -> None:
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def frame(self, screen: pygame.Surface, rects: List[pygame.Rect]) -> None:
+        '''
+        Called by `GameLoop` with each presented frame and the rects updated on screen, while
+        `active`. Only copies, so it costs about as much as the frame's dirty area.
+        '''
+        index = self.frames
+        self.frames += 1
+        bounds = screen.get_rect()
+        # A resized screen starts the encoder on a new canvas, which needs the whole frame
+        if bounds.size != self._last_size:
+            self._need_full = True
+        if self._need_full:
+            areas = [bounds]
+        else:
+            areas = [r for r in (bounds.clip(r) for r in rects) if r.w and r.h]
+        if self._queue.full():
+            self.dropped += 1
+            self._need_full = True
+            return
+        patches = [(screen.subsurface(area).copy(), area.topleft) for area in areas]
+        # Only this thread adds to the queue, so there's still room
+        self._queue.put_nowait((index, bounds.size, patches))
+        self._last_size = bounds.size
+        self._need_full = False
+
+    def _encode(self) -> None:
+        canvas: Optional[pygame.Surface] = None
+        stream: Optional[BinaryIO] = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                index, size, patches = item
+                if canvas is None or canvas.get_size() != size:
+                    canvas = pygame.Surface(size)
+                    if stream is not None:
+                        stream.close()
+                        stream = None
+                if not patches and self.fmt == 'png':
+                    continue
+                canvas.blits(patches, doreturn=False)
+                if self.fmt == 'png':
+                    pygame.image.save(canvas, str(self._dir / f'frame_{index:06d}.png'))
+                else:
+                    if stream is None:
+                        stream = open(self._dir / f'frames_{size[0]}x{size[1]}.rgb', 'ab')
+                    stream.write(pygame.image.tobytes(canvas, 'RGB'))
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def report(self) -> str:
+        return f'{self.frames - self.dropped} frames captured, {self.dropped} dropped'
+
+    def stop(self) -> Optional[Path]:
+        '''
+        Ends the capture, waiting for the frames already queued to be written. Returns the
+        directory they were written to.
+        '''
+        if not self.active:
+            return None
+        self.active = False
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        print('Capture written to', self._dir, f'({self.report()})')
+        return self._dir
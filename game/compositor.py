@@ -0,0 +1,112 @@
+# WWII Pacific Front - compositor.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Composition of heavy sprite layers on a worker thread.
+
+`Compositor` blits a group of sprites (the board: ocean, grid, ships, shot markers) into a
+back buffer on its own thread. pygame releases the GIL while blitting, so this runs on
+another core while the main thread handles the next frame's events, updates and UI. The
+main thread only blits the finished buffer to the screen.
+
+Each frame shows the board as it was composed during the previous frame, so the board lags
+one frame behind the UI drawn on top of it.
+'''
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pygame
+import pygame.sprite
+
+from .memory import track
+
+BlitJob = List[Tuple[pygame.Surface, Tuple[int, int]]]
+
+
+class Compositor:
+    '''
+    Composes the sprites of `group` into window-sized buffers, in layer order.
+
+    Sprites whose image the main thread draws on (rather than replacing it) must have a
+    `version` attribute that changes whenever they do. The worker then gets a copy of their
+    image, taken again only when the version or image changes.
+    '''
+    def __init__(
+        self,
+        group: pygame.sprite.LayeredUpdates,
+        fill: pygame.Color=pygame.Color('Black')
+    ) -> None:
+        self.group = group
+        self.fill = fill
+        self._copies: Dict[int, Tuple[pygame.Surface, int, pygame.Surface]] = {}
+        self._buffers: List[pygame.Surface] = []
+        self._back = 0
+        self._job: Optional[BlitJob] = None
+        self._done: Optional[pygame.Surface] = None
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='Compositor', daemon=True)
+        self._thread.start()
+
+    def _snapshot(self) -> BlitJob:
+        job = []
+        for spr in self.group.sprites():
+            if not getattr(spr, 'visible', 1):
+                continue
+            image = spr.image
+            version = getattr(spr, 'version', None)
+            if version is not None:
+                cached = self._copies.get(id(spr))
+                if cached is None or cached[0] is not spr.image or cached[1] != version:
+                    cached = self._copies[id(spr)] = (spr.image, version, spr.image.copy())
+                image = cached[2]
+                image.set_alpha(spr.image.get_alpha())
+            job.append((image, spr.rect.topleft))
+        return job
+
+    def wait(self) -> Optional[pygame.Surface]:
+        '''
+        Waits for the frame being composed, if any, and returns the last finished frame.
+        '''
+        with self._cond:
+            while self._busy:
+                self._cond.wait()
+            return self._done
+
+    def submit(self, size: Tuple[int, int]) -> None:
+        '''
+        Starts composing the sprites as they are now. Call `wait()` first.
+        '''
+        if not self._buffers or self._buffers[0].get_size() != size:
+            self._buffers = [track(pygame.Surface(size), self) for _ in range(2)]
+            self._done = None
+        job = self._snapshot()
+        with self._cond:
+            self._job = job
+            self._busy = True
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._job is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job, self._job = self._job, None
+                buffer = self._buffers[self._back]
+            buffer.fill(self.fill)
+            buffer.blits(job, doreturn=False)
+            with self._cond:
+                # The other buffer may still be on its way to the screen; the next frame uses it
+                self._done = buffer
+                self._back = 1 - self._back
+                self._busy = False
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -1,41 +1,268 @@
+import atexit
+import copy
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
 from pathlib import Path
-from typing import Any, ClassVar, Dict, Optional, Type
+from typing import Any, Callable, ClassVar, DefaultDict, Dict, List, Optional, Type
+
+ConfigCallback = Callable[[str, Any], None]
+
+
+def _flatten(table: Dict[str, Any], prefix: str='') -> Dict[str, Any]:
+    '''
+    Maps every dotted key in a nested dict (tables included) to its value.
+    '''
+    flat = {}
+    for k, v in table.items():
+        key = prefix + k
+        flat[key] = v
+        if isinstance(v, dict):
+            flat.update(_flatten(v, key + '.'))
+    return flat
+
+
+def _merge_defaults(table: Dict[str, Any], defaults: Dict[str, Any]) -> None:
+    '''
+    Fills keys missing from `table` with (copies of) the values in `defaults`, recursively.
+    '''
+    for k, v in defaults.items():
+        if k not in table:
+            table[k] = copy.deepcopy(v)
+        elif isinstance(v, dict) and isinstance(table[k], dict):
+            _merge_defaults(table[k], v)
 
-import toml
 
 class Config:
+    '''
+    A TOML-backed settings store with dotted-key access: `config['game.shot_style']`.
+
+    Every write is atomic: the file is written to a temporary file next to it, which then
+    replaces the original, so a crash mid-write can't leave a half-written file behind.
+
+    With `write_behind=True`, assignments only change the in-memory copy. A background
+    thread writes the file once changes have been quiet for `debounce` seconds (or at least
+    every `max_delay` seconds while they keep coming), and on `flush()`, `close()` or exit.
+
+    Lookups go through a flat table of dotted keys, so reading a setting every frame is a
+    single dict lookup. Keys missing from the file are filled in from `default_config`.
+    Instead of polling, use `subscribe()` to be told when a setting changes, whether by
+    assignment or, after `watch()`, by someone editing the file.
+    '''
     # Meant to be overridden by subclasses
     default_config: ClassVar[Optional[Dict[str, Any]]] = None
     default_filename: ClassVar[Optional[str]] = None
 
-    def __init__(self, cfg_file: Optional[str]=None) -> None:
+    def __init__(
+        self,
+        cfg_file: Optional[str]=None,
+        write_behind: bool=False,
+        debounce: float=0.5,
+        max_delay: float=5.0
+    ) -> None:
         self.cfg_file = cfg_file if cfg_file is not None else type(self).default_filename
         if self.cfg_file is None or self.cfg_file == '':
             self.cfg_file = type(self).__name__ + '.toml'
-        self._full_path = Path(__file__).parent.parent / cfg_file
-        self._file_obj = open(self._full_path, mode='r+')
-        self._config = toml.load(self._file_obj)
+        self._full_path = Path(__file__).parent.parent / self.cfg_file
+        self._config = self._load()
+        self._flat = _flatten(self._config)
+        self._mtime = self._stat_mtime()
+        self._subscribers: DefaultDict[str, List[ConfigCallback]] = defaultdict(list)
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+        self.write_behind = write_behind
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        # Held from taking a snapshot until it's on disk, so an older snapshot can't land last
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._closed = False
+        self._first_change = 0.0
+        self._last_change = 0.0
+        self._writer: Optional[threading.Thread] = None
+        if write_behind:
+            self._writer = threading.Thread(
+                target=self._write_behind_loop, name=f'{type(self).__name__} writer', daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.close)
 
     def __getitem__(self, key: str):
-        fullkey = key.split('.')
-        curr_layer = self._config[fullkey.pop(0)]
-        for k in fullkey:
-            curr_layer = curr_layer[k]
-        return curr_layer
+        return self._flat[key]
 
     def __setitem__(self, key: str, value: Any):
         fullkey = key.split('.')
-        curr_layer = self._config[fullkey.pop(0)]
-        for k in fullkey[:-1]:
-            curr_layer = curr_layer[k]
-        curr_layer[fullkey[-1]] = value
-        self._file_obj.seek(0)
-        self._file_obj.truncate()
-        toml.dump(self._config, self._file_obj)
+        with self._cond:
+            curr_layer = self._config[fullkey.pop(0)]
+            for k in fullkey[:-1]:
+                curr_layer = curr_layer[k]
+            if curr_layer.get(fullkey[-1], value) == value and key in self._flat:
+                return
+            curr_layer[fullkey[-1]] = value
+            self._flat = _flatten(self._config) if isinstance(value, dict) else self._flat
+            self._flat[key] = value
+            now = time.monotonic()
+            if not self._dirty:
+                self._first_change = now
+            self._last_change = now
+            self._dirty = True
+            if self.write_behind:
+                self._cond.notify_all()
+        self._notify([key])
+        if not self.write_behind:
+            self.flush()
+
+    def subscribe(self, key: str, callback: ConfigCallback) -> Callable[[], None]:
+        '''
+        Calls `callback(key, value)` whenever `key` changes. Subscribing to a table
+        (e.g. `'music_sounds'`) also reports changes to every key inside it.
+
+        Changes picked up by `watch()` are reported from the watcher thread, so callbacks
+        that touch pygame should hand the change over to the main thread (for instance with
+        `pygame.event.post()`).
+
+        Returns a function that unsubscribes.
+        '''
+        self._subscribers[key].append(callback)
+        return lambda: self._subscribers[key].remove(callback)
+
+    def _notify(self, keys: List[str]) -> None:
+        for key in keys:
+            value = self._flat.get(key)
+            parts = key.split('.')
+            for i in range(len(parts), 0, -1):
+                for callback in list(self._subscribers.get('.'.join(parts[:i]), ())):
+                    callback(key, value)
+
+    def reload(self) -> List[str]:
+        '''
+        Re-reads the file and notifies subscribers of every key whose value changed.
+        Returns those keys. Changes not written out yet are replaced by the file's contents.
+        '''
+        config = self._load()
+        flat = _flatten(config)
+        with self._cond:
+            changed = [
+                k for k, v in flat.items()
+                if not isinstance(v, dict) and self._flat.get(k) != v
+            ]
+            self._config = config
+            self._flat = flat
+            self._mtime = self._stat_mtime()
+        self._notify(changed)
+        return changed
+
+    def check_reload(self) -> List[str]:
+        '''
+        Reloads the file if its modification time changed since it was last read or written.
+        '''
+        # _write() replaces the file and records its mtime under the lock, so our own writes
+        # are never mistaken for edits
+        with self._cond:
+            if self._stat_mtime() == self._mtime:
+                return []
+        return self.reload()
+
+    def watch(self, interval: float=1.0) -> None:
+        '''
+        Starts a background thread that calls `check_reload()` every `interval` seconds, so
+        edits to the file reach subscribers without a restart.
+        '''
+        if self._watcher is not None:
+            return
+
+        def watch_loop() -> None:
+            while not self._stop_watching.wait(interval):
+                self.check_reload()
+
+        self._watcher = threading.Thread(
+            target=watch_loop, name=f'{type(self).__name__} watcher', daemon=True
+        )
+        self._watcher.start()
 
     def full(self):
         return self._config.copy()
 
+    def _load(self) -> Dict[str, Any]:
+        import toml
+        with open(self._full_path) as f:
+            config = toml.load(f)
+        if type(self).default_config is not None:
+            _merge_defaults(config, type(self).default_config)
+        return config
+
+    def _stat_mtime(self) -> int:
+        try:
+            return os.stat(self._full_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def flush(self) -> None:
+        '''
+        Writes pending changes to disk now, if there are any.
+        '''
+        with self._write_lock:
+            with self._cond:
+                if not self._dirty:
+                    return
+                snapshot = copy.deepcopy(self._config)
+                self._dirty = False
+            self._write(snapshot)
+
+    def close(self) -> None:
+        '''
+        Stops the background writer (if any) and flushes pending changes.
+        '''
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._stop_watching.set()
+        for thread in (self._writer, self._watcher):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join()
+        self.flush()
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        import toml
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=self._full_path.name + '.', suffix='.tmp', dir=self._full_path.parent
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                toml.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            # Our own write shouldn't look like an external edit to check_reload(), which
+            # compares under the same lock
+            with self._cond:
+                os.replace(tmp_path, self._full_path)
+                self._mtime = self._stat_mtime()
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _write_behind_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if not self._dirty:
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    write_at = min(
+                        self._last_change + self.debounce, self._first_change + self.max_delay
+                    )
+                    if now >= write_at:
+                        break
+                    self._cond.wait(write_at - now)
+                if self._closed:
+                    return
+            self.flush()
+
     @classmethod
     def subclass_factory(
         cls,
@@ -57,6 +284,6 @@ class GameOptions(Config):
         }
     }
     default_filename = 'options.toml'
-    
-    def __init__(self, cfg_file: str='options.toml') -> None:
-        super().__init__(cfg_file)
+
+    def __init__(self, cfg_file: str='options.toml', **kwargs) -> None:
+        super().__init__(cfg_file, **kwargs)
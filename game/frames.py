@@ -0,0 +1,31 @@
+# WWII Pacific Front - frames.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+The websocket frame format shared by the game client (multiplayer.py) and the server
+(server/__main__.py).
+
+One websocket carries several logical channels; every frame is
+`{"channel": ..., "type": ..., "data": ...}`. This module only needs the standard library,
+so the server can use it without pulling in pygame.
+'''
+
+import json
+from typing import Final, Optional, Tuple, Union
+
+CHANNELS: Final[Tuple[str, ...]] = ('chat', 'lobby', 'game', 'telemetry')
+DEFAULT_CHANNEL: Final[str] = 'chat' # for frames without a channel
+
+
+def encode_frame(channel: str, msg_type: str, data: Optional[dict]=None) -> str:
+    return json.dumps({'channel': channel, 'type': msg_type, 'data': data or {}})
+
+
+def decode_frame(raw: Union[str, bytes]) -> Tuple[str, dict]:
+    '''
+    Splits a frame into its channel and the message (`{'type': ..., 'data': ...}`).
+    Raises `ValueError` if it isn't a JSON object.
+    '''
+    msg = json.loads(raw)
+    if not isinstance(msg, dict):
+        raise ValueError(f'Expected a JSON object, got {type(msg).__name__}')
+    return msg.pop('channel', DEFAULT_CHANNEL), msg
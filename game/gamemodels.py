@@ -6,10 +6,14 @@ This module defines the game classes.
 '''
 
 from pathlib import Path
-from typing import Callable, Final, List, Tuple
-from math import copysign
+from typing import Any, Callable, Dict, Final, List, Optional, Set, Tuple, Type, Union
+from math import copysign, isfinite
+from time import perf_counter
 from enum import IntFlag, auto
+import importlib
+import os
 import re
+import time
 
 # import numpy as np
 import pygame
@@ -25,7 +29,67 @@ import pygame.key
 import pygame.freetype
 # import pygame.surfarray
 
+from .audio import MusicPlayer, SoundBank
+from .capture import FrameCapture
+from .compositor import Compositor
+from .config import GameOptions
+from .latency import LatencyTracker, note_effect
+from .memory import SurfaceTracker, track
+from .particles import ParticleSystem
+from .perf import FrameStats, PerfOverlay
+from .placement import PlacementMask
+from .profiling import FrameProfiler
+from .pygame_async_utils import FixedTimestep
+from .surface_utils import tile_surface
+from .timeline import Animation, Timeline, schedule
+
 TILE_SIZE: Final[int] = 64
+# Tile sizes the board can be zoomed to; these are the only sizes images are built for.
+# Zooming glides through the sizes in between, in steps of ZOOM_STEP pixels, one step every
+# ZOOM_STEP_MS, by scaling a frame of the board rather than building images at those sizes
+ZOOM_LEVELS: Final[Tuple[int, ...]] = (64, 48, 32, 16)
+ZOOM_STEP: Final[int] = 8
+ZOOM_STEP_MS: Final[int] = 16
+PULSE_STEP: Final[int] = 32 # ms between alpha changes of pulsing shot markers
+HEADLESS_DRIVERS: Final[Tuple[str, ...]] = ('dummy', 'offscreen') # SDL video drivers with no window
+
+def pulse_alpha(ticks: int) -> int:
+    '''
+    Alpha at `ticks` of the 2 second fade out/fade in cycle shot markers pulse with.
+    '''
+    mod_ticks = ticks % 2000
+    if mod_ticks // 1000 == 0:
+        return 255 - mod_ticks // 8
+    return 5 + mod_ticks // 8
+
+class MipCache:
+    '''
+    Pre-scaled copies of `base`, an image drawn for `TILE_SIZE` tiles. Each of the
+    `ZOOM_LEVELS` is scaled the first time it's asked for and kept after that, so zooming
+    never scales anything twice. Other sizes are scaled on every call and not kept.
+    '''
+    def __init__(self, base: pygame.Surface, owner: Any=None) -> None:
+        self.base = base
+        self.owner = owner
+        self.levels: Dict[int, pygame.Surface] = {TILE_SIZE: base}
+
+    def get(self, tile_size: int) -> pygame.Surface:
+        surf = self.levels.get(tile_size)
+        if surf is None:
+            w, h = self.base.get_size()
+            size = (w * tile_size // TILE_SIZE, h * tile_size // TILE_SIZE)
+            colorkey = self.base.get_colorkey()
+            # Smoothing would blend the colorkey into the edges
+            if colorkey is None and self.base.get_bitsize() in (24, 32):
+                surf = pygame.transform.smoothscale(self.base, size)
+            else:
+                surf = pygame.transform.scale(self.base, size)
+                if colorkey is not None:
+                    surf.set_colorkey(colorkey)
+            surf = track(surf, self.owner)
+            if tile_size in ZOOM_LEVELS:
+                self.levels[tile_size] = surf
+        return surf
 
 class Player:
     def __init__(self) -> None:
@@ -46,72 +110,157 @@ class JapanCPUPlayer(Player):
     '''
     pass
 
-class SingleTileOverlay(pygame.sprite.DirtySprite):
-    def __init__(
-        self,
-        color: pygame.Color,
-        pos: Tuple[int, int],
-        *groups: pygame.sprite.AbstractGroup,
-        layer: int=800,
-        offset: Tuple[int, int]=(0, 0)
-    ) -> None:
-        self._layer = layer
-        super().__init__(*groups)
-        self.color = color
-        self.image = pygame.Surface((TILE_SIZE, TILE_SIZE))
-        self.image.set_colorkey(~color)
-        tx, ty = pos
-        ox, oy = offset
-        self.rect = self.image.fill(~color).move(tx * TILE_SIZE, ty * TILE_SIZE)
-        self.rect.move_ip(ox % TILE_SIZE, oy % TILE_SIZE)
-        
-        pygame.draw.rect(self.image, color, self.image.get_rect(), 2, 16)
+class TileOverlayLayer(pygame.sprite.DirtySprite):
+    '''
+    Per-tile overlays (shot markers, highlights) for a whole board, stored as one byte per
+    tile: an index into the overlay kinds added with `add_kind()`.
 
+    Every tile of a kind is drawn with that kind's one stamp. Only the tiles around the
+    window are drawn, all in one `Surface.blits()` call, into an image that's redrawn when
+    scrolling uncovers tiles it doesn't have or the board is zoomed. Changing a tile only
+    redraws that tile. Call `refresh()` once per frame, after scrolling.
+    '''
+    MARGIN: Final[int] = 4 # tiles drawn past each edge of the window, so scrolling rarely redraws
 
-class FiredTile(pygame.sprite.DirtySprite):
     def __init__(
         self,
-        hit: bool,
-        pos: Tuple[int, int],
+        size: Tuple[int, int],
         *groups: pygame.sprite.AbstractGroup,
-        layer: int=20,
-        offset: Tuple[int, int]=(0, 0)
+        layer: int=800,
+        colorkey: pygame.Color=pygame.Color('Magenta')
     ) -> None:
         self._layer = layer
         super().__init__(*groups)
-        self.hit = hit
-        img_file = 'hit.png' if hit else 'miss.png'
-        self.image = pygame.image.load(
-            Path(__file__).parent.parent / 'assets' / 'img' / img_file
-        ).convert()
-        self.image.set_colorkey(pygame.Color('Magenta'))
-        tx, ty = pos
-        ox, oy = offset
-        self.rect = self.image.get_rect().move(tx * TILE_SIZE, ty * TILE_SIZE)
-        self.rect.move_ip(ox % TILE_SIZE, oy % TILE_SIZE)
-
-        self.dirty = 2
+        w, h = size
+        self.size = size
+        self.tiles = bytearray(w * h)
+        self.kinds: List[Optional[str]] = [None]
+        self.stamps: List[Optional[MipCache]] = [None]
+        self._kind_ids: Dict[Optional[str], int] = {None: 0}
+        self.colorkey = colorkey
+        self.tile_size = TILE_SIZE
+        self.window = pygame.Rect(0, 0, 0, 0) # in tiles: the part of the board in self.image
+        self.image = pygame.Surface((0, 0))
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.alpha = 255
+        self.version = 0 # changes whenever the image is drawn on, for Compositor
+        self._stale = True
+
+    def add_kind(self, name: str, stamp: pygame.Surface) -> None:
+        '''
+        Adds an overlay kind drawn with `stamp`, a `TILE_SIZE` image.
+        '''
+        if len(self.kinds) > 255:
+            raise ValueError('TileOverlayLayer only has room for 255 kinds')
+        self._kind_ids[name] = len(self.kinds)
+        self.kinds.append(name)
+        self.stamps.append(MipCache(stamp, self))
+
+    def __getitem__(self, pos: Tuple[int, int]) -> Optional[str]:
+        x, y = pos
+        return self.kinds[self.tiles[y * self.size[0] + x]]
 
-        bordercolor = pygame.Color('Red' if hit else 'White')
-        pygame.draw.rect(self.image, bordercolor, self.image.get_rect(), 2, 16)
+    def __setitem__(self, pos: Tuple[int, int], kind: Optional[str]) -> None:
+        x, y = pos
+        kind_id = self._kind_ids[kind]
+        self.tiles[y * self.size[0] + x] = kind_id
+        if self._stale or not self.window.collidepoint(pos):
+            return
+        ts = self.tile_size
+        dest = pygame.Rect((x - self.window.x) * ts, (y - self.window.y) * ts, ts, ts)
+        self.image.fill(self.colorkey, dest)
+        if kind_id:
+            self.image.blit(self.stamps[kind_id].get(ts), dest)
+        self.version += 1
+        self.dirty = 1
+
+    def fill_from(self, tiles: bytes) -> None:
+        '''
+        Replaces every tile at once with the kind ids in `tiles` (one byte per tile, row by
+        row). The image is redrawn on the next `refresh()`.
+        '''
+        self.tiles[:] = tiles
+        self._stale = True
+
+    def set_alpha(self, alpha: int) -> None:
+        self.alpha = alpha
+        self.image.set_alpha(alpha)
+        self.dirty = 1
+
+    def set_tile_size(self, tile_size: int, origin: Tuple[int, int]) -> None:
+        self.tile_size = tile_size
+        self.rect.topleft = (
+            origin[0] + self.window.x * tile_size, origin[1] + self.window.y * tile_size
+        )
+        self._stale = True
+
+    def refresh(self) -> None:
+        '''
+        Redraws the image if the window now shows tiles outside of it.
+        '''
+        ts = self.tile_size
+        w, h = self.size
+        # Where the board's top left corner is on screen
+        ox = self.rect.x - self.window.x * ts
+        oy = self.rect.y - self.window.y * ts
+        sw, sh = pygame.display.get_surface().get_size()
+        board = pygame.Rect(0, 0, w, h)
+        visible = pygame.Rect(-ox // ts, -oy // ts, sw // ts + 2, sh // ts + 2).clip(board)
+        if not self._stale and self.window.contains(visible):
+            return
+        window = visible.inflate(self.MARGIN * 2, self.MARGIN * 2).clip(board)
+        size = (window.w * ts, window.h * ts)
+        if self.image.get_size() != size:
+            self.image = track(pygame.Surface(size), self)
+            self.image.set_colorkey(self.colorkey)
+            self.image.set_alpha(self.alpha)
+        self.image.fill(self.colorkey)
+        stamps = [mips.get(ts) if mips is not None else None for mips in self.stamps]
+        tiles = self.tiles
+        blit_seq = []
+        for y in range(window.top, window.bottom):
+            row = y * w
+            dy = (y - window.top) * ts
+            for x in range(window.left, window.right):
+                kind_id = tiles[row + x]
+                if kind_id:
+                    blit_seq.append((stamps[kind_id], ((x - window.left) * ts, dy)))
+        self.image.blits(blit_seq, doreturn=False)
+        self.version += 1
+        self.window = window
+        self.rect = pygame.Rect((ox + window.x * ts, oy + window.y * ts), size)
+        self._stale = False
+        self.dirty = 1
+
+    @staticmethod
+    def outline_stamp(color: pygame.Color) -> pygame.Surface:
+        '''
+        A rounded tile outline in `color`, for highlight kinds.
+        '''
+        stamp = pygame.Surface((TILE_SIZE, TILE_SIZE))
+        stamp.set_colorkey(~color)
+        stamp.fill(~color)
+        pygame.draw.rect(stamp, color, stamp.get_rect(), 2, 16)
+        return stamp
 
-    def update(self, *args, **kwargs) -> None:
-        mod_ticks = pygame.time.get_ticks() % 2000
-        if mod_ticks // 1000 == 0:
-            self.image.set_alpha(255 - mod_ticks // 8)
-        else:
-            self.image.set_alpha(5 + mod_ticks // 8)
 
 class Ship(pygame.sprite.DirtySprite):
+    # Scaled images per (image file, vertical), shared by every ship with the same image file
+    _mips: Dict[Tuple[str, bool], MipCache] = {}
+
     def __init__(
         self,
         pos: Tuple[int, int],
         img_file: str,
         *groups: pygame.sprite.AbstractGroup,
-        layer: int=10
+        layer: int=10,
+        vertical: bool=False
     ):
         self._layer = layer
-        self.image = pygame.image.load(Path(__file__).parent.parent / 'assets' / 'img' / img_file)
+        self.img_file = img_file
+        self.vertical = vertical
+        self.mips = Ship.get_mips(img_file, vertical, self)
+        self.image = self.mips.get(TILE_SIZE)
         self.rect = self.image.get_rect()
         self.rect.topleft = pos
         self.rect.x *= TILE_SIZE
@@ -119,9 +268,57 @@ class Ship(pygame.sprite.DirtySprite):
         self.tile_rect = pygame.Rect(pos, (self.rect.w // TILE_SIZE, self.rect.h // TILE_SIZE))
         super().__init__(*groups)
 
+    @classmethod
+    def get_mips(cls, img_file: str, vertical: bool=False, owner: Any=None) -> MipCache:
+        '''
+        The `MipCache` for `img_file` (drawn horizontally, bow to the right), turned a
+        quarter clockwise if `vertical`. Each image is loaded and rotated only once.
+        '''
+        key = (img_file, vertical)
+        if key not in cls._mips:
+            if vertical:
+                base = pygame.transform.rotate(cls.get_mips(img_file).base, -90)
+            else:
+                base = pygame.image.load(
+                    Path(__file__).parent.parent / 'assets' / 'img' / img_file
+                )
+            cls._mips[key] = MipCache(track(base, owner), owner)
+        return cls._mips[key]
+
+    @property
+    def length(self) -> int:
+        return max(self.tile_rect.w, self.tile_rect.h)
+
+    def place(
+        self,
+        pos: Tuple[int, int],
+        vertical: bool,
+        tile_size: int,
+        origin: Tuple[int, int]
+    ) -> None:
+        '''
+        Moves the ship to board tile `pos`, turned to `vertical`. Take it out of its
+        `ShipGroup` first, since the group indexes ships by the tiles they cover.
+        '''
+        if vertical != self.vertical:
+            self.vertical = vertical
+            self.mips = Ship.get_mips(self.img_file, vertical, self)
+        w, h = self.mips.base.get_size()
+        self.tile_rect = pygame.Rect(pos, (w // TILE_SIZE, h // TILE_SIZE))
+        self.set_tile_size(tile_size, origin)
+
+    def set_tile_size(self, tile_size: int, origin: Tuple[int, int]) -> None:
+        self.image = self.mips.get(tile_size)
+        self.rect = self.image.get_rect(topleft=(
+            origin[0] + self.tile_rect.x * tile_size, origin[1] + self.tile_rect.y * tile_size
+        ))
+        self.dirty = 1
+
 class ShipGroup(pygame.sprite.Group):
     def __init__(self, *sprites: Ship) -> None:
         self.ship_tiles = {}
+        # Called with (ship, added) whenever a ship is added or removed
+        self.on_change: List[Callable[[Ship, bool], None]] = []
         super().__init__(*sprites)
     
     def add_internal(self, sprite: Ship) -> None:
@@ -131,13 +328,24 @@ class ShipGroup(pygame.sprite.Group):
                 for x in range(sprite.tile_rect.left, sprite.tile_rect.right)
                 for y in range(sprite.tile_rect.top, sprite.tile_rect.bottom)
         })
+        for callback in self.on_change:
+            callback(sprite, True)
+
+    def remove_internal(self, sprite: Ship) -> None:
+        super().remove_internal(sprite)
+        for x in range(sprite.tile_rect.left, sprite.tile_rect.right):
+            for y in range(sprite.tile_rect.top, sprite.tile_rect.bottom):
+                if self.ship_tiles.get((x, y)) is sprite:
+                    del self.ship_tiles[(x, y)]
+        for callback in self.on_change:
+            callback(sprite, False)
 
 class ShotStyle(IntFlag):
     CLASSIC = auto()
     CLEAN = auto()
     BOTH = CLASSIC | CLEAN
 
-class FiringGrid(pygame.sprite.DirtySprite):
+class FiringGrid(TileOverlayLayer):
     def __init__(
         self,
         size: Tuple[int, int],
@@ -147,19 +355,13 @@ class FiringGrid(pygame.sprite.DirtySprite):
         layer: int=800,
         offset: Tuple[int, int]=(0, 0)
     ) -> None:
-        self._layer = layer
-        super().__init__(*groups)
-        w, h = size
-        ox, oy = offset
-        self.rect = pygame.Rect(ox, oy, w * TILE_SIZE, h * TILE_SIZE)
         ckey = pygame.Color('Magenta')
-        self.image = pygame.Surface(self.rect.size)
-        self.image.fill(ckey)
-        self.image.set_colorkey(ckey)
-        self.hit_img = pygame.Surface((TILE_SIZE, TILE_SIZE))
+        super().__init__(size, *groups, layer=layer, colorkey=ckey)
+        self.rect.topleft = offset
+        self.hit_img = track(pygame.Surface((TILE_SIZE, TILE_SIZE)), self)
         self.hit_img.fill(ckey)
         self.hit_img.set_colorkey(ckey)
-        self.miss_img = self.hit_img.copy()
+        self.miss_img = track(self.hit_img.copy(), self)
         if style & ShotStyle.CLASSIC:
             self.hit_img.blit(pygame.image.load(
                 Path(__file__).parent.parent / 'assets' / 'img' / 'hit.png'
@@ -174,33 +376,57 @@ class FiringGrid(pygame.sprite.DirtySprite):
             pygame.draw.rect(
                 self.miss_img, pygame.Color('White'), self.miss_img.get_rect(), 2, 16
             )
+        self.add_kind('hit', self.hit_img)
+        self.add_kind('miss', self.miss_img)
         self.style = style
         self.ship_group = ship_group
-        self.shots = [[False for i in range(w)] for j in range(h)]
-        self.dirty = 2
+        # Shots in the order they were fired
+        self.fired: List[Tuple[int, int, bool]] = []
+        # Called with (pos, hit) for every shot
+        self.on_shot: List[Callable[[Tuple[int, int], bool], None]] = []
+        self.pulse = schedule(self.pulse_step)
 
     def shoot(self, pos: Tuple[int, int]) -> bool:
         x, y = pos
-        self.shots[y][x] = True
-        if pos in self.ship_group.ship_tiles:
-            self.image.blit(self.hit_img, (x * TILE_SIZE, y * TILE_SIZE))
-            return True
-        else:
-            self.image.blit(self.miss_img, (x * TILE_SIZE, y * TILE_SIZE))
-            return False
+        note_effect('click')
+        hit = pos in self.ship_group.ship_tiles
+        self[pos] = 'hit' if hit else 'miss'
+        self.fired.append((x, y, hit))
+        for callback in self.on_shot:
+            callback(pos, hit)
+        return hit
+
+    def sunk(self, ship: Ship) -> bool:
+        '''
+        Whether every tile of `ship` has been shot.
+        '''
+        r = ship.tile_rect
+        return all(
+            self[x, y] is not None for y in range(r.top, r.bottom) for x in range(r.left, r.right)
+        )
 
-    def update(self, *args, **kwargs) -> None:
-        mod_ticks = pygame.time.get_ticks() % 2000
-        if mod_ticks // 1000 == 0:
-            self.image.set_alpha(255 - mod_ticks // 8)
-        else:
-            self.image.set_alpha(5 + mod_ticks // 8)
+    def damaged(self, ship: Ship) -> bool:
+        '''
+        Whether any tile of `ship` has been shot.
+        '''
+        r = ship.tile_rect
+        return any(
+            self[x, y] is not None for y in range(r.top, r.bottom) for x in range(r.left, r.right)
+        )
+
+    def pulse_step(self, ticks: int) -> int:
+        self.set_alpha(pulse_alpha(ticks))
+        return PULSE_STEP - ticks % PULSE_STEP
+
+    def kill(self) -> None:
+        self.pulse.cancel()
+        super().kill()
 
 
 class Grid(pygame.sprite.DirtySprite):
     def __init__(self, width, height, pos_x, pos_y, color): #varibles grid has
         super().__init__()
-        self.image = pygame.Surface([width, height])
+        self.image = track(pygame.Surface([width, height]), self)
         self.image.fill(color)
         self.rect = self.image.get_rect()
         self.rect.center = [pos_x,pos_y]
@@ -216,20 +442,37 @@ class OverlayGrid(pygame.sprite.DirtySprite):
     ) -> None:
         self._layer = layer
         super().__init__(*groups)
-        w, h = size
-        sw, sh = w * TILE_SIZE, h * TILE_SIZE
+        self.pos = pos
+        self.size = size
+        self.color = color
+        self._levels: Dict[int, pygame.Surface] = {}
+        self.image = self._build(TILE_SIZE)
         px, py = pos
-        self.image = pygame.Surface((sw, sh))
-        rect_img = pygame.Surface((TILE_SIZE, TILE_SIZE))
-        ckey = ~color # Guaranteed to be different
-        self.image.set_colorkey(ckey)
-        rect_img.fill(ckey)
-        pygame.draw.rect(rect_img, color, rect_img.get_rect(), 2, 16)
-        for i in range(w):
-            for j in range(h):
-                self.image.blit(rect_img, ((px + i) * TILE_SIZE, (py + j) * TILE_SIZE))
         self.rect = self.image.get_rect().move(px * TILE_SIZE, py * TILE_SIZE)
 
+    def _build(self, tile_size: int) -> pygame.Surface:
+        w, h = self.size
+        px, py = self.pos
+        image = track(pygame.Surface((w * tile_size, h * tile_size)), self)
+        # Outlines are drawn at each size rather than scaled, so they stay crisp
+        rect_img = pygame.Surface((tile_size, tile_size))
+        ckey = ~self.color # Guaranteed to be different
+        image.set_colorkey(ckey)
+        rect_img.fill(ckey)
+        pygame.draw.rect(rect_img, self.color, rect_img.get_rect(), 2, tile_size // 4)
+        tile_surface(image, rect_img, image.get_rect().move(px * tile_size, py * tile_size))
+        if tile_size in ZOOM_LEVELS:
+            self._levels[tile_size] = image
+        return image
+
+    def set_tile_size(self, tile_size: int, origin: Tuple[int, int]) -> None:
+        self.image = self._levels.get(tile_size) or self._build(tile_size)
+        px, py = self.pos
+        self.rect = self.image.get_rect().move(
+            origin[0] + px * tile_size, origin[1] + py * tile_size
+        )
+        self.dirty = 1
+
 
 class Background(pygame.sprite.DirtySprite):
     def __init__(
@@ -241,14 +484,14 @@ class Background(pygame.sprite.DirtySprite):
     ):
         self._layer = layer
         super().__init__(*groups)
-        self.base_image = pygame.image.load(
+        self.base_image = track(pygame.image.load(
             Path(__file__).parent.parent / 'assets' / 'img' / img_file
-        )
-        self.image = pygame.transform.scale(self.base_image, size)
+        ), self)
+        self.image = track(pygame.transform.scale(self.base_image, size), self)
         self.rect = self.image.get_rect()
 
     def resize(self, size: Tuple[int, int]) -> None:
-        self.image = pygame.transform.scale(self.base_image, size)
+        self.image = track(pygame.transform.scale(self.base_image, size), self)
         self.rect = self.image.get_rect()
 
 class TiledBackground(pygame.sprite.DirtySprite):
@@ -261,8 +504,7 @@ class TiledBackground(pygame.sprite.DirtySprite):
     ) -> None:
         self._layer = layer
         super().__init__(*groups)
-        w, h = size
-        self.image = pygame.Surface((w * TILE_SIZE, h * TILE_SIZE))
+        self.size = size
         bgtile_img = pygame.image.load(
             Path(__file__).parent.parent / 'assets' / 'img' / img_file
         ).convert()
@@ -279,23 +521,38 @@ class TiledBackground(pygame.sprite.DirtySprite):
             (0, bgtile_rect.h - 1),
             (bgtile_rect.w, bgtile_rect.h - 1)
         )
-
+        self.tile_mips = MipCache(bgtile_img, self)
+        self._levels: Dict[int, pygame.Surface] = {}
+        self.image = self._build(TILE_SIZE)
         self.rect = self.image.get_rect()
 
-        img_w, img_h = bgtile_img.get_rect().size
-        for i in range(w):
-            for j in range(h):
-                self.image.blit(bgtile_img, (i * img_w, j * img_h))
+    def _build(self, tile_size: int) -> pygame.Surface:
+        w, h = self.size
+        image = track(pygame.Surface((w * tile_size, h * tile_size)), self)
+        tile_surface(image, self.tile_mips.get(tile_size))
+        if tile_size in ZOOM_LEVELS:
+            self._levels[tile_size] = image
+        return image
+
+    def set_tile_size(self, tile_size: int, origin: Tuple[int, int]) -> None:
+        self.image = self._levels.get(tile_size) or self._build(tile_size)
+        self.rect = self.image.get_rect(topleft=origin)
+        self.dirty = 1
 
 class Crosshair(pygame.sprite.DirtySprite):
     def __init__(self, img_file: str, *groups: pygame.sprite.AbstractGroup) -> None:
         self._layer = 1000 # set to a large amount so it is in front of everything
         super().__init__(*groups)
-        self.image = pygame.image.load(Path(__file__).parent.parent / 'assets' / 'img' / img_file)
+        self.image = track(
+            pygame.image.load(Path(__file__).parent.parent / 'assets' / 'img' / img_file), self
+        )
         self.rect = self.image.get_rect()
 
     def update(self):
-        self.rect.center = pygame.mouse.get_pos()
+        mpos = pygame.mouse.get_pos()
+        if mpos != self.rect.center:
+            self.rect.center = mpos
+            note_effect('pointer')
 
 # InvertCrosshair: Requires Numpy.
 
@@ -332,41 +589,223 @@ class SnapCrosshair(pygame.sprite.DirtySprite):
         self._layer = 1000
         super().__init__(*groups)
         self.color = color
-        self.image = pygame.Surface((TILE_SIZE, TILE_SIZE))
-        self.image.set_colorkey(~color)
-        self.rect = self.image.fill(~color)
-        pygame.draw.rect(self.image, color, self.rect.move(-32, -32), 4, 16)
-        pygame.draw.rect(self.image, color, self.rect.move(32, -32), 4, 16)
-        pygame.draw.rect(self.image, color, self.rect.move(-32, 32), 4, 16)
-        pygame.draw.rect(self.image, color, self.rect.move(32, 32), 4, 16)
-        pygame.draw.rect(self.image, color, self.rect, 4, 16)
-    
+        self._levels: Dict[int, pygame.Surface] = {}
+        self.tile_size = TILE_SIZE
+        self.image = self._build(TILE_SIZE)
+        self.rect = self.image.get_rect()
+        self.mouse_pos = (-1, -1)
+
+    def _build(self, tile_size: int) -> pygame.Surface:
+        image = track(pygame.Surface((tile_size, tile_size)), self)
+        image.set_colorkey(~self.color)
+        rect = image.fill(~self.color)
+        half, radius = tile_size // 2, tile_size // 4
+        pygame.draw.rect(image, self.color, rect.move(-half, -half), 4, radius)
+        pygame.draw.rect(image, self.color, rect.move(half, -half), 4, radius)
+        pygame.draw.rect(image, self.color, rect.move(-half, half), 4, radius)
+        pygame.draw.rect(image, self.color, rect.move(half, half), 4, radius)
+        pygame.draw.rect(image, self.color, rect, 4, radius)
+        if tile_size in ZOOM_LEVELS:
+            self._levels[tile_size] = image
+        return image
+
+    def set_tile_size(self, tile_size: int) -> None:
+        self.tile_size = tile_size
+        self.image = self._levels.get(tile_size) or self._build(tile_size)
+        self.rect.size = self.image.get_size()
+        self.dirty = 1
+
     def update(self, *args, offset: Tuple[int, int], **kwargs) -> None:
         mx, my = pygame.mouse.get_pos()
         ox, oy = offset
-        self.rect.x = mx - (mx - ox) % TILE_SIZE
-        self.rect.y = my - (my - oy) % TILE_SIZE
+        ts = self.tile_size
+        snapped = (mx - (mx - ox) % ts, my - (my - oy) % ts)
+        if snapped != self.rect.topleft:
+            self.rect.topleft = snapped
+            # Scrolling the board under a still pointer moves it too, but that's not
+            # the pointer's doing
+            if (mx, my) != self.mouse_pos:
+                note_effect('pointer')
+        self.mouse_pos = (mx, my)
+
+class Minimap(pygame.sprite.DirtySprite):
+    '''
+    The whole board at `tile_px` pixels per tile, showing ships and shots.
+
+    It's never redrawn as a whole: ship and shot changes (through `ShipGroup.on_change` and
+    `FiringGrid.on_shot`) each fill just their own tiles, so keeping it current costs the
+    same on any board size. The visible area is outlined by a separate `MinimapViewport`.
+    '''
+    COLORS: Final[Dict[str, pygame.Color]] = {
+        'ocean': pygame.Color(20, 60, 110),
+        'ship': pygame.Color(150, 150, 150),
+        'miss': pygame.Color(230, 230, 230),
+        'hit': pygame.Color(220, 40, 40),
+    }
+
+    def __init__(
+        self,
+        firegrid: 'FiringGrid',
+        *groups: pygame.sprite.AbstractGroup,
+        tile_px: Optional[int]=None,
+        pos: Tuple[int, int]=(8, 8),
+        layer: int=900
+    ) -> None:
+        self._layer = layer
+        super().__init__(*groups)
+        w, h = firegrid.size
+        # By default, fit the map in about 160 pixels
+        self.tile_px = tile_px if tile_px is not None else max(1, min(4, 160 // max(w, h)))
+        self.image = track(pygame.Surface((w * self.tile_px, h * self.tile_px)), self)
+        self.image.fill(self.COLORS['ocean'])
+        self.rect = self.image.get_rect(topleft=pos)
+        self.firegrid = firegrid
+        for ship in firegrid.ship_group:
+            self.on_ship_change(ship, True)
+        for x, y, hit in firegrid.fired:
+            self.on_shot((x, y), hit)
+        firegrid.ship_group.on_change.append(self.on_ship_change)
+        firegrid.on_shot.append(self.on_shot)
+
+    def set_tile(self, pos: Tuple[int, int], kind: str) -> None:
+        x, y = pos
+        px = self.tile_px
+        self.image.fill(self.COLORS[kind], (x * px, y * px, px, px))
+        self.dirty = 1
+
+    def _tile_kind(self, pos: Tuple[int, int]) -> str:
+        x, y = pos
+        if self.firegrid[pos] is not None:
+            return 'hit' if pos in self.firegrid.ship_group.ship_tiles else 'miss'
+        return 'ship' if pos in self.firegrid.ship_group.ship_tiles else 'ocean'
+
+    def on_ship_change(self, ship: Ship, added: bool) -> None:
+        r = ship.tile_rect
+        for x in range(r.left, r.right):
+            for y in range(r.top, r.bottom):
+                self.set_tile((x, y), self._tile_kind((x, y)))
+
+    def on_shot(self, pos: Tuple[int, int], hit: bool) -> None:
+        self.set_tile(pos, 'hit' if hit else 'miss')
+
+    def tile_at(self, screen_pos: Tuple[int, int]) -> Tuple[float, float]:
+        '''
+        The board tile (fractional) under a point of the minimap, in window coordinates.
+        '''
+        return (
+            (screen_pos[0] - self.rect.x) / self.tile_px,
+            (screen_pos[1] - self.rect.y) / self.tile_px,
+        )
+
+
+class MinimapViewport(pygame.sprite.DirtySprite):
+    '''
+    Outlines the part of the board in the window on top of a `Minimap`.
+    '''
+    def __init__(
+        self,
+        minimap: Minimap,
+        board_group: 'ScrollingGroup',
+        *groups: pygame.sprite.AbstractGroup,
+        color: pygame.Color=pygame.Color('Yellow'),
+        layer: int=901
+    ) -> None:
+        self._layer = layer
+        super().__init__(*groups)
+        self.minimap = minimap
+        self.board_group = board_group
+        self.color = color
+        self.image = pygame.Surface((0, 0))
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self._area = pygame.Rect(0, 0, 0, 0)
+
+    def update(self, *args, **kwargs) -> None:
+        ts = self.board_group.tile_size
+        px = self.minimap.tile_px
+        ox, oy = self.board_group.get_offset()
+        sw, sh = pygame.display.get_surface().get_size()
+        area = pygame.Rect(
+            self.minimap.rect.x + -ox * px // ts,
+            self.minimap.rect.y + -oy * px // ts,
+            max(sw * px // ts, 2),
+            max(sh * px // ts, 2),
+        ).clip(self.minimap.rect)
+        if area == self._area:
+            return
+        if area.size != self._area.size:
+            ckey = ~self.color
+            self.image = track(pygame.Surface(area.size), self)
+            self.image.fill(ckey)
+            self.image.set_colorkey(ckey)
+            pygame.draw.rect(self.image, self.color, self.image.get_rect(), 1)
+        self._area = area
+        self.rect = pygame.Rect(area)
+        self.dirty = 1
+
 
 class ScrollingGroup(pygame.sprite.LayeredDirty):
+    '''
+    A `LayeredDirty` that pans all of its sprites with the arrow keys/WASD.
+
+    Velocities are in pixels per second. `update()` is a fixed-timestep simulation step
+    that only moves the (sub-pixel) scroll position; call `interpolate()` once per rendered
+    frame to move the sprites to where they should be drawn.
+    '''
     def __init__(
         self,
         ref_spr: pygame.sprite.DirtySprite,
         *sprites: pygame.sprite.DirtySprite,
-        base_velocity: int=3,
+        base_velocity: float=180,
         **kwargs
     ) -> None:
         super().__init__(ref_spr, *sprites, **kwargs)
         self.ref_spr = ref_spr
         self.base_velocity = base_velocity
-        self.velx = 0
-        self.vely = 0
+        self.velx = 0.0
+        self.vely = 0.0
         self.keys_dirty = False
         self.vel_dirty = False
-    
-    def update(self, *args, **kwargs) -> None:
+        self.pos = pygame.Vector2(ref_spr.rect.topleft)
+        self.prev_pos = pygame.Vector2(self.pos)
+        self.tile_size = TILE_SIZE
+
+    def set_tile_size(self, tile_size: int, anchor: Tuple[int, int]) -> None:
+        '''
+        Switches every sprite that supports it to `tile_size` tiles, keeping the point of the
+        board under `anchor` (in window coordinates) where it is.
+        '''
+        anchor_v = pygame.Vector2(anchor)
+        origin = anchor_v - (anchor_v - self.pos) * (tile_size / self.tile_size)
+        sw, sh = pygame.display.get_surface().get_size()
+        # The reference sprite's size once it's switched too (in the loop below)
+        rw = self.ref_spr.rect.w * tile_size // self.tile_size
+        rh = self.ref_spr.rect.h * tile_size // self.tile_size
+        self.tile_size = tile_size
+        origin.x = max(min(0, sw - rw), min(0, origin.x))
+        origin.y = max(min(0, sh - rh), min(0, origin.y))
+        self.pos.update(origin)
+        self.prev_pos.update(origin)
+        topleft = (round(origin.x), round(origin.y))
+        for spr in self.sprites():
+            if hasattr(spr, 'set_tile_size'):
+                spr.set_tile_size(tile_size, topleft)
+
+    def center_on(self, tile: Tuple[float, float]) -> None:
+        '''
+        Jumps (without scrolling) so that board `tile` is in the middle of the window.
+        '''
+        sw, sh = pygame.display.get_surface().get_size()
+        rw, rh = self.ref_spr.rect.size
+        x = sw / 2 - tile[0] * self.tile_size
+        y = sh / 2 - tile[1] * self.tile_size
+        self.pos.x = max(min(0, sw - rw), min(0, x))
+        self.pos.y = max(min(0, sh - rh), min(0, y))
+        self.prev_pos.update(self.pos)
+
+    def update(self, *args, dt: float=1 / 60, **kwargs) -> None:
         super().update(*args, **kwargs)
-        ref_rect = pygame.Rect(self.ref_spr.rect)
-        sw, sh = pygame.display.get_window_size()
+        self.prev_pos.update(self.pos)
+        sw, sh = pygame.display.get_surface().get_size()
 
         if self.keys_dirty:
             keys = pygame.key.get_pressed()
@@ -381,47 +820,243 @@ class ScrollingGroup(pygame.sprite.LayeredDirty):
             if all(
                 map(lambda k: not keys[k], [pygame.K_w, pygame.K_UP, pygame.K_s, pygame.K_DOWN])
             ):
-                self.vely = 0
+                self.vely = 0.0
             if all(
                 map(lambda k: not keys[k], [pygame.K_a, pygame.K_LEFT, pygame.K_d, pygame.K_RIGHT])
             ):
-                self.velx = 0
+                self.velx = 0.0
             self.keys_dirty = False
 
         if self.vel_dirty:
             if self.velx != 0:
-                self.velx = int(copysign(self.base_velocity, self.velx))
+                self.velx = copysign(self.base_velocity, self.velx)
             if self.vely != 0:
-                self.vely = int(copysign(self.base_velocity, self.vely))
+                self.vely = copysign(self.base_velocity, self.vely)
             self.vel_dirty = False
 
-        effective_velx = self.velx
-        effective_vely = self.vely
-
-        if ref_rect.left >= -1:
-            ref_rect.left = 0
-            effective_velx = min(0, effective_velx)
-        if ref_rect.top >= -1:
-            ref_rect.top = 0
-            effective_vely = min(0, effective_vely)
-        if ref_rect.right <= sw + 1:
-            ref_rect.right = sw
-            effective_velx = max(0, effective_velx)
-        if ref_rect.bottom <= sh + 1:
-            ref_rect.bottom = sh
-            effective_vely = max(0, effective_vely)
-
-        if (effective_velx, effective_vely) == (0, 0):
+        if (self.velx, self.vely) == (0, 0):
+            return
+
+        # Keep the reference sprite (the board) covering the window
+        rw, rh = self.ref_spr.rect.size
+        self.pos.x = max(min(0, sw - rw), min(0, self.pos.x + self.velx * dt))
+        self.pos.y = max(min(0, sh - rh), min(0, self.pos.y + self.vely * dt))
+
+    def interpolate(self, alpha: float=1.0) -> None:
+        '''
+        Moves the sprites to the scroll position blended between the last two simulation
+        steps. `alpha` usually comes from `FixedTimestep.alpha`.
+        '''
+        drawn = self.prev_pos.lerp(self.pos, min(max(alpha, 0.0), 1.0))
+        dx = round(drawn.x) - self.ref_spr.rect.x
+        dy = round(drawn.y) - self.ref_spr.rect.y
+        if (dx, dy) == (0, 0):
             return
+        if (self.velx, self.vely) != (0, 0):
+            # Only the movement keys set a velocity
+            note_effect('key')
 
         for spr in self:
             if spr.dirty == 0:
                 spr.dirty = 1
-            spr.rect.move_ip(effective_velx, effective_vely)
+            spr.rect.move_ip(dx, dy)
 
     def get_offset(self) -> Tuple[int, int]:
         return self.ref_spr.rect.topleft
 
+class PlacementGhost(pygame.sprite.DirtySprite):
+    '''
+    The translucent ship following the pointer while a ship is being placed, tinted red
+    where it can't go. Its images are made once per ship image, orientation, tile size and
+    legality, so moving it around only swaps images.
+    '''
+    def __init__(self, *groups: pygame.sprite.AbstractGroup, layer: int=900) -> None:
+        self._layer = layer
+        super().__init__(*groups)
+        self.image = pygame.Surface((0, 0))
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.visible = 0
+        self.img_file = ''
+        self.vertical = False
+        self.legal = True
+        self.tile_pos = (0, 0)
+        self.tile_size = TILE_SIZE
+        self.origin = (0, 0)
+        self._images: Dict[Tuple[str, bool, int, bool], pygame.Surface] = {}
+
+    def show(
+        self,
+        img_file: str,
+        vertical: bool,
+        tile_pos: Tuple[int, int],
+        legal: bool,
+        origin: Tuple[int, int]
+    ) -> None:
+        self.origin = origin
+        self.img_file = img_file
+        self.vertical = vertical
+        self.tile_pos = tile_pos
+        self.legal = legal
+        self.visible = 1
+        self._redraw()
+
+    def _redraw(self) -> None:
+        key = (self.img_file, self.vertical, self.tile_size, self.legal)
+        image = self._images.get(key)
+        if image is None:
+            mips = Ship.get_mips(self.img_file, self.vertical)
+            image = track(mips.get(self.tile_size).copy(), self)
+            if not self.legal:
+                image.fill((255, 90, 90), special_flags=pygame.BLEND_RGB_MULT)
+            image.set_alpha(170)
+            self._images[key] = image
+        self.image = image
+        self.rect = image.get_rect(topleft=(
+            self.origin[0] + self.tile_pos[0] * self.tile_size,
+            self.origin[1] + self.tile_pos[1] * self.tile_size,
+        ))
+        self.dirty = 1
+
+    def set_tile_size(self, tile_size: int, origin: Tuple[int, int]) -> None:
+        self.tile_size = tile_size
+        self.origin = origin
+        if self.img_file:
+            self._redraw()
+
+
+class PlacementEditor:
+    '''
+    Drag and drop ship placement on a board: press on a ship to pick it up, drag it and
+    release to drop it. Right click (or R) turns the ship held.
+
+    Legal positions for the ship held come from a `PlacementMask` kept in step with
+    `ship_group` through `ShipGroup.on_change`, and are outlined on the board while a ship
+    is held. Dragging only looks up the tile under the pointer in the mask.
+
+    Ships that `firegrid` has hit can't be picked up, since their hits would be left behind.
+    '''
+    def __init__(
+        self,
+        board_group: 'ScrollingGroup',
+        ship_group: ShipGroup,
+        size: Tuple[int, int],
+        firegrid: Optional[FiringGrid]=None
+    ) -> None:
+        self.board_group = board_group
+        self.ship_group = ship_group
+        self.firegrid = firegrid
+        self.mask = PlacementMask(size)
+        for ship in ship_group:
+            self.mask.occupy(ship.tile_rect)
+        ship_group.on_change.append(self.on_ship_change)
+        self.highlight = TileOverlayLayer(size, board_group, layer=850)
+        self.highlight.add_kind('legal', TileOverlayLayer.outline_stamp(pygame.Color('Green')))
+        self.highlight.visible = 0
+        self.ghost = PlacementGhost(board_group)
+        self.ghost.set_tile_size(board_group.tile_size, board_group.get_offset())
+        self.held: Optional[Ship] = None
+        self.vertical = False
+        self.grab = (0, 0) # the held ship's tile under the pointer
+        self.hover: Optional[Tuple[int, int]] = None
+
+    def on_ship_change(self, ship: Ship, added: bool) -> None:
+        if added:
+            self.mask.occupy(ship.tile_rect)
+        else:
+            self.mask.release(ship.tile_rect)
+
+    def tile_at(self, screen_pos: Tuple[int, int]) -> Tuple[int, int]:
+        ox, oy = self.board_group.get_offset()
+        ts = self.board_group.tile_size
+        return ((screen_pos[0] - ox) // ts, (screen_pos[1] - oy) // ts)
+
+    def pick(self, screen_pos: Tuple[int, int]) -> bool:
+        '''
+        Picks up the ship under `screen_pos`, if there is one and it hasn't been hit.
+        '''
+        tile = self.tile_at(screen_pos)
+        ship = self.ship_group.ship_tiles.get(tile)
+        if ship is None or self.firegrid is not None and self.firegrid.damaged(ship):
+            return False
+        self.held = ship
+        self.vertical = ship.vertical
+        self.grab = (tile[0] - ship.tile_rect.x, tile[1] - ship.tile_rect.y)
+        ship.remove(self.ship_group)
+        ship.visible = 0
+        self._show_anchors()
+        self.move(screen_pos)
+        return True
+
+    def rotate(self) -> None:
+        if self.held is None:
+            return
+        self.vertical = not self.vertical
+        self.grab = self.grab[::-1]
+        self._show_anchors()
+        self.hover = None
+        self.move(pygame.mouse.get_pos())
+
+    def _show_anchors(self) -> None:
+        self.highlight.fill_from(self.mask.anchors(self.held.length, self.vertical))
+        self.highlight.visible = 1
+
+    def _anchor(self, tile: Tuple[int, int]) -> Tuple[int, int]:
+        return (tile[0] - self.grab[0], tile[1] - self.grab[1])
+
+    def move(self, screen_pos: Tuple[int, int]) -> None:
+        '''
+        Moves the ship held to the tile under `screen_pos`.
+        '''
+        tile = self.tile_at(screen_pos)
+        if self.held is None or tile == self.hover:
+            return
+        self.hover = tile
+        anchor = self._anchor(tile)
+        legal = self.mask.fits(anchor, self.held.length, self.vertical)
+        self.ghost.show(
+            self.held.img_file, self.vertical, anchor, legal, self.board_group.get_offset()
+        )
+
+    def drop(self, screen_pos: Tuple[int, int]) -> bool:
+        '''
+        Puts the ship held down at the tile under `screen_pos`, or back where it came from
+        if it doesn't fit there. Returns whether it moved.
+        '''
+        ship = self.held
+        if ship is None:
+            return False
+        anchor = self._anchor(self.tile_at(screen_pos))
+        moved = self.mask.fits(anchor, ship.length, self.vertical)
+        if moved:
+            ship.place(
+                anchor, self.vertical, self.board_group.tile_size, self.board_group.get_offset()
+            )
+        self.cancel()
+        return moved
+
+    def cancel(self) -> None:
+        '''
+        Puts the ship held down where it is (where it was picked up, unless `drop()` moved it).
+        '''
+        ship = self.held
+        if ship is None:
+            return
+        ship.add(self.ship_group)
+        ship.visible = 1
+        self.held = None
+        self.hover = None
+        self.ghost.visible = 0
+        self.highlight.visible = 0
+
+    def update(self) -> None:
+        '''
+        Call once per frame, after scrolling, so the ship held stays under the pointer.
+        '''
+        if self.held is not None:
+            self.move(pygame.mouse.get_pos())
+            self.highlight.refresh()
+
+
 class Button(pygame.sprite.DirtySprite):
     def __init__(
         self,
@@ -445,7 +1080,7 @@ class Button(pygame.sprite.DirtySprite):
         self.bg = bg
         self.font = font
         self.text_size = text_size
-        self.image = pygame.Surface(rect.size)
+        self.image = track(pygame.Surface(rect.size), self)
         self.ckey = ckey
         self.border_radius = border_radius
         self.image.fill(ckey)
@@ -454,8 +1089,8 @@ class Button(pygame.sprite.DirtySprite):
         text_rect = self.font.get_rect(text, size=text_size)
         text_rect.center = self.image.get_rect().center
         self.font.render_to(self.image, text_rect, None, fg, size=text_size)
-        self.base_image = self.image.copy()
-        self.hover_image = self.image.copy()
+        self.base_image = track(self.image.copy(), self)
+        self.hover_image = track(self.image.copy(), self)
         self.hover_image.fill(pygame.Color('#404040'), special_flags=pygame.BLEND_SUB)
         self.hover_image.set_colorkey(pygame.Color('#BF00BF'))
         self.hover = False
@@ -469,6 +1104,7 @@ class Button(pygame.sprite.DirtySprite):
                 self.hover = True
                 self.image = self.hover_image
                 self.dirty = 1
+                note_effect('pointer')
             mdown = pygame.mouse.get_pressed()[0]
             if mdown and self.hover and not self.clicked:
                 self.click()
@@ -479,6 +1115,7 @@ class Button(pygame.sprite.DirtySprite):
             self.hover = False
             self.image = self.base_image
             self.dirty = 1
+            note_effect('pointer')
 
 class TextInput(pygame.sprite.DirtySprite):
     def __init__(
@@ -503,47 +1140,56 @@ class TextInput(pygame.sprite.DirtySprite):
         self.bg = bg
         self.font = font
         self.text_size = text_size
-        self.image = pygame.Surface(rect.size)
-        self.image.fill(bg)
-        text_rect = self.font.get_rect(self.text, size=text_size).move(text_size // 2, 0)
-        text_rect.centery += self.image.get_rect().centery
-        self.font.render_to(self.image, text_rect, None, fg, size=text_size)
+        self.image = track(pygame.Surface(rect.size), self)
         self.focus = focus
         self.curs_rect = pygame.Rect(0, 0, 3, font.get_sized_height(text_size))
         self.curs_rect.centery = self.image.get_rect().centery
         self.curs_vis = False
-
-    def update(self, *args, **kwargs) -> None:
-        mpos = pygame.mouse.get_pos()
-        mdown = pygame.mouse.get_pressed()[0]
-        if self.rect.collidepoint(mpos) and mdown:
-            self.focus = True
-        elif mdown:
-            self.focus = False
+        self.blink_on = False
+        self.redraw()
+        schedule(self.blink)
+
+    def redraw(self) -> None:
+        '''
+        Draws the text (and the cursor, while it's showing). Only called when one of them
+        changes, so an idle text box costs nothing per frame.
+        '''
         self.image.fill(self.bg)
         text_rect = self.font.get_rect(self.text, size=self.text_size).move(self.text_size // 2, 0)
         text_rect.centery = self.image.get_rect().centery
         self.font.render_to(self.image, text_rect, None, self.fg, size=self.text_size)
-        tick_comp = pygame.time.get_ticks() % 2000 >= 1000
-        if tick_comp and not self.curs_vis and self.focus:
-            self.curs_vis = True
-            self.dirty = 1
-        elif not tick_comp and self.curs_vis:
-            self.curs_vis = False
-            self.dirty = 1
         if self.curs_vis:
             curs_offset = self.font.get_rect(self.text[:self.cursor], size=self.text_size).right
             self.image.fill(self.fg, self.curs_rect.move(curs_offset + self.text_size // 2, 0))
-    
+        self.dirty = 1
+
+    def _show_cursor(self) -> None:
+        curs_vis = self.blink_on and self.focus
+        if curs_vis != self.curs_vis:
+            self.curs_vis = curs_vis
+            self.redraw()
+
+    def blink(self, ticks: int) -> int:
+        # The cursor shows during the second half of every 2 seconds
+        self.blink_on = ticks % 2000 >= 1000
+        self._show_cursor()
+        return 1000 - ticks % 1000
+
+    def update(self, *args, **kwargs) -> None:
+        mdown = pygame.mouse.get_pressed()[0]
+        if mdown:
+            self.focus = self.rect.collidepoint(pygame.mouse.get_pos())
+            self._show_cursor()
+
     def handle_event(self, event: pygame.event.Event) -> bool:
         if not self.focus:
             return False
+        before = (self.text, self.cursor)
         if event.type == pygame.TEXTINPUT:
             self.text = (
                 self.text[:self.cursor] + event.text + self.text[self.cursor:]
             )
             self.cursor += 1
-            self.dirty = 1
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_RETURN:
                 return True
@@ -561,7 +1207,6 @@ class TextInput(pygame.sprite.DirtySprite):
                             self.text[:self.cursor - 1] + self.text[self.cursor:]
                         )
                         self.cursor -= 1
-                    self.dirty = 1
             elif event.key == pygame.K_DELETE:
                 if self.cursor < len(self.text):
                     if event.mod & (pygame.KMOD_CTRL | pygame.KMOD_ALT):
@@ -574,7 +1219,6 @@ class TextInput(pygame.sprite.DirtySprite):
                         self.text = (
                             self.text[:self.cursor] + self.text[self.cursor + 1:]
                         )
-                    self.dirty = 1
             elif event.key == pygame.K_LEFT:
                 if self.cursor != 0:
                     if event.mod & pygame.KMOD_CTRL:
@@ -583,7 +1227,6 @@ class TextInput(pygame.sprite.DirtySprite):
                         self.cursor -= idx_from_end
                     else:
                         self.cursor -= 1
-                    self.dirty = 1
             elif event.key == pygame.K_RIGHT:
                 if self.cursor != len(self.text):
                     if event.mod & pygame.KMOD_CTRL:
@@ -592,193 +1235,62 @@ class TextInput(pygame.sprite.DirtySprite):
                         self.cursor += ahead_idx
                     else:
                         self.cursor += 1
-                    self.dirty = 1
+        if (self.text, self.cursor) != before:
+            self.redraw()
+            note_effect('key')
         return False
 
 
 class Scene:
+    # Track (0-based) GameLoop fades to when this scene starts; None keeps the current one
+    music_track: Optional[int] = None
+
     def __init__(self, gameloop: 'GameLoop', caption: str) -> None:
         self.gameloop = gameloop
         self.render_group = pygame.sprite.LayeredDirty()
         self.caption = caption
 
-    def update(self) -> None:
-        pass
-
-    def render(self, screen: pygame.Surface) -> List[pygame.Rect]:
+    def fixed_update(self, dt: float) -> None:
+        '''
+        Advances the simulation by exactly `dt` seconds. Called zero or more times per frame
+        by `GameLoop`, so anything that moves should do it here, in units per second.
+        '''
         pass
 
-    def handle_event(self, event: pygame.event.Event) -> None:
+    def layout(self, size: Tuple[int, int]) -> None:
+        '''
+        Positions the scene's sprites for a `size` screen. Called by `GameLoop` when the
+        window is resized, unless it renders at a fixed logical size (`scaled`).
+        '''
         pass
 
-class MainMenu(Scene):
-    def __init__(self, gameloop: 'GameLoop') -> None:
-        super().__init__(gameloop, 'WWIIL: Pacific Front')
-        ssize = gameloop.screen.get_rect().size
-        self.bg = Background('menubg.png', ssize, self.render_group)
-        self.gameloop = gameloop
-        self.font = pygame.freetype.Font(
-            Path(__file__).parent.parent / 'assets' / 'font' / 'CutiveMono-Regular.ttf', 48
-        )
-        frect = self.font.get_rect('WWII: Pacific Front')
-        frect.right = ssize[0] * 14 // 15
-        frect.bottom = ssize[1] // 8
-        titlepos = frect.topleft
-        self.font.render_to(self.bg.image, titlepos, 'WWII: Pacific Front', pygame.Color('Black'))
-        brect = pygame.Rect(ssize[0] // 15, ssize[1] // 5 + 50, 200, 50)
-        self.buttons = pygame.sprite.Group()
-        self.storybutton = Button(
-            brect,
-            'Story',
-            self.font,
-            pygame.Color('White'),
-            pygame.Color('Navy'),
-            lambda: gameloop.change_scene('menu_story'),
-            self.render_group, self.buttons
-        )
-        self.freeplaybutton = Button(
-            brect.move(250, 0),
-            'Freeplay',
-            self.font,
-            pygame.Color('White'),
-            pygame.Color('Mediumblue'),
-            lambda: gameloop.change_scene('menu_freeplay'),
-            self.render_group, self.buttons
-        )
-        self.multiplayerbutton = Button(
-            brect.move(0, 75),
-            'Multiplayer',
-            self.font,
-            pygame.Color('White'),
-            pygame.Color('Red'),
-            lambda: gameloop.change_scene('menu_multiplayer'),
-            self.render_group, self.buttons
-        )
-        self.optionsbutton = Button(
-            brect.move(250, 75),
-            'Options',
-            self.font,
-            pygame.Color('Black'),
-            pygame.Color('White'),
-            lambda: gameloop.change_scene('menu_options'),
-            self.render_group, self.buttons
-        )
-    
-    def update(self) -> None:
-        self.buttons.update()
-    
-    def render(self, screen: pygame.Surface) -> List[pygame.Rect]:
-        return self.render_group.draw(screen)
-
-    def handle_event(self, event: pygame.event.Event) -> None:
-        if event.type == pygame.VIDEORESIZE:
-            self.resize(event.size)
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                self.gameloop.running = False
-
-    def resize(self, size: Tuple[int, int]) -> None:
-        self.bg.resize(size)
-        frect = self.font.get_rect('WWII: Pacific Front')
-        frect.right = size[0] * 14 // 15
-        frect.bottom = size[1] // 8
-        titlepos = frect.topleft
-        self.font.render_to(self.bg.image, titlepos, None, pygame.Color('Black'))
-        brect = pygame.Rect(size[0] // 15, size[1] // 5 + 50, 200, 50)
-        self.storybutton.rect = brect
-        self.freeplaybutton.rect = brect.move(250, 0)
-        self.multiplayerbutton.rect = brect.move(0, 75)
-        self.optionsbutton.rect = brect.move(250, 75)
-        self.bg.dirty = 1
-
-class StoryMenu(Scene):
-    def __init__(self, gameloop: 'GameLoop') -> None:
-        super().__init__(gameloop, 'WWII: Pacific Front - Story')
-        ssize = gameloop.screen.get_rect().size
-        self.bg = Background('menubg.png', ssize, self.render_group)
-        self.bg.base_image.fill(pygame.Color('#404040'), special_flags=pygame.BLEND_SUB)
-        self.bg.image.fill(pygame.Color('#404040'), special_flags=pygame.BLEND_SUB)
-
-        self.gameloop = gameloop
-        self.font = pygame.freetype.Font(
-            Path(__file__).parent.parent / 'assets' / 'font' / 'CutiveMono-Regular.ttf', 48
-        )
-        frect = self.font.get_rect('Story')
-        frect.centerx = ssize[0] // 2
-        frect.top = 20
-        self.bg.image.fill(pygame.Color('Gray16'), pygame.Rect(0, 0, ssize[0], frect.bottom + 20))
-        titlepos = frect.topleft
-        self.font.render_to(self.bg.image, titlepos, None, pygame.Color('White'))
-        brect = pygame.Rect(0, ssize[1] - 100, 200, 50)
-        brect.right = ssize[0] // 2 - 25
-        self.buttons = pygame.sprite.Group()
-        self.startbutton = Button(
-            brect,
-            'Begin',
-            self.font,
-            pygame.Color('White'),
-            pygame.Color('Navy'),
-            lambda: gameloop.change_scene('menu_story'),
-            self.render_group, self.buttons
-        )
-        self.backbutton = Button(
-            brect.move(250, 0),
-            'Back',
-            self.font,
-            pygame.Color('Black'),
-            pygame.Color('White'),
-            lambda: gameloop.change_scene('menu_main'),
-            self.render_group, self.buttons
-        )
-        irect = pygame.Rect(0, 0, 500, 50)
-        irect.center = self.bg.rect.center
-        self.nameinput = TextInput(
-            irect,
-            self.font,
-            pygame.Color('Black'),
-            pygame.Color('White'),
-            self.render_group,
-            text_size=24
-        )
-
     def update(self) -> None:
-        self.buttons.update()
-        self.nameinput.update()
+        pass
 
     def render(self, screen: pygame.Surface) -> List[pygame.Rect]:
-        return self.render_group.draw(screen)
+        pass
 
     def handle_event(self, event: pygame.event.Event) -> None:
-        self.nameinput.handle_event(event)
-        if event.type == pygame.VIDEORESIZE:
-            self.resize(event.size)
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                self.gameloop.change_scene('menu_main')
+        pass
 
-    def resize(self, size: Tuple[int, int]) -> None:
-        self.bg.resize(size)
-        frect = self.font.get_rect('Story')
-        frect.centerx = size[0] // 2
-        frect.top = 20
-        self.bg.image.fill(pygame.Color('Gray16'), pygame.Rect(0, 0, size[0], frect.bottom + 20))
-        titlepos = frect.topleft
-        self.font.render_to(self.bg.image, titlepos, None, pygame.Color('White'))
-        brect = pygame.Rect(0, size[1] - 100, 200, 50)
-        brect.right = size[0] // 2 - 25
-        self.startbutton.rect = brect
-        self.backbutton.rect = brect.move(250, 0)
-        self.nameinput.rect.center = self.bg.rect.center
-        self.bg.dirty = 1
-
-class FreeplayMenu(Scene):
-    pass
+    def handle_message(self, msg: dict) -> None:
+        '''
+        Called with each message a network client receives while this scene is active.
+        '''
+        pass
 
-class MultiplayerMenu(Scene):
-    pass
+    def seed(self, seed: int) -> None:
+        '''
+        Seeds the scene's random effects, so a replay looks like its recording. Called by
+        `GameLoop.set_seed()`, and when the scene starts if a seed was set.
+        '''
+        pass
 
-class OptionsMenu(Scene):
-    pass
+    def close(self) -> None:
+        '''
+        Called when `GameLoop` switches away from this scene.
+        '''
+        pass
 
 class StoryGame(Scene):
     pass
@@ -789,132 +1301,545 @@ class FreeplayGame(Scene):
 class MultiplayerGame(Scene):
     pass
 
+class BoardDemo(Scene):
+    '''
+    The battleship board tech demo (`python -m game.gamemodels`).
+    '''
+    MOVEMENT_KEYS: Final[List[int]] = [
+        pygame.K_w, pygame.K_UP,
+        pygame.K_a, pygame.K_LEFT,
+        pygame.K_s, pygame.K_DOWN,
+        pygame.K_d, pygame.K_RIGHT,
+    ]
+
+    def __init__(self, gameloop: 'GameLoop', size: Tuple[int, int]=(30, 30)) -> None:
+        super().__init__(gameloop, 'gamemodels test')
+        self.base_vel = 180 # pixels per second
+        self.shift_vel = 300
+
+        self.background = TiledBackground('ocean.png', size)
+        self.board_group = ScrollingGroup(self.background, base_velocity=self.base_vel)
+        self.overlay_grid = OverlayGrid((0, 0), size, self.board_group)
+        self.overlay_grid.visible = 0
+
+        self.ui_group = pygame.sprite.LayeredDirty()
+
+        #Ships
+        self.ship_group = ShipGroup()
+        for pos in [(0, 0), (5, 1), (10, 0), (15, 1), (20, 0)]:
+            Ship(pos, 'essex.png', self.board_group, self.ship_group)
+
+        self.firegrid = FiringGrid(size, ShotStyle.CLEAN, self.ship_group, self.board_group)
+        self.firegrid.shoot((0, 0))
+        self.firegrid.shoot((1, 1))
+
+        #Crosshair
+        self.crosshair = SnapCrosshair(pygame.Color('Black'), self.ui_group)
+
+        self.minimap = Minimap(self.firegrid, self.ui_group)
+        self.viewport = MinimapViewport(self.minimap, self.board_group, self.ui_group)
+
+        self.particles = ParticleSystem(seed=gameloop.seed)
+        # Loaded (and any placeholders synthesized) now, so the first shot doesn't pay for it
+        self.sounds = gameloop.sounds
+
+        # P switches between firing and moving ships around
+        self.editor = PlacementEditor(self.board_group, self.ship_group, size, self.firegrid)
+        self.placing = False
+
+        # While zooming, the board is already switched to the target level, and the screen
+        # shows zoom_frames, the glide's in-between frames, made when the zoom started
+        self.zoom_anim: Optional[Animation] = None
+        self.zooming = False
+        self.zoom_frames: List[pygame.Surface] = []
+        self.zoom_index = -1
+
+        # With threaded composition the board is drawn by the compositor, and render_group
+        # only has the UI on top of it
+        self.compositor: Optional[Compositor] = None
+        self.compose_pending = False
+        if gameloop.threaded_compose:
+            self.compositor = Compositor(self.board_group)
+            self.render_group.add(*self.ui_group)
+        else:
+            self.render_group.add(*self.board_group, *self.ui_group)
+
+    def handle_event(self, event: pygame.event.Event) -> None:
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.gameloop.running = False
+            if event.key in (pygame.K_LSHIFT, pygame.K_RSHIFT):
+                self.overlay_grid.visible = 1
+                self.crosshair.dirty = 1
+                self.board_group.base_velocity = self.shift_vel
+                self.board_group.vel_dirty = True
+                self.board_group.keys_dirty = True
+            if event.key in self.MOVEMENT_KEYS:
+                self.board_group.keys_dirty = True
+            if event.key == pygame.K_p:
+                self.placing = not self.placing
+                self.editor.cancel()
+            if event.key == pygame.K_r and self.placing:
+                self.editor.rotate()
+        elif event.type == pygame.KEYUP:
+            if event.key in (pygame.K_LSHIFT, pygame.K_RSHIFT):
+                self.overlay_grid.visible = 0
+                self.crosshair.dirty = 1
+                self.board_group.base_velocity = self.base_vel
+                self.board_group.vel_dirty = True
+                self.board_group.keys_dirty = True
+            if event.key in self.MOVEMENT_KEYS:
+                self.board_group.keys_dirty = True
+        elif event.type == pygame.MOUSEMOTION:
+            self.crosshair.dirty = 1
+            self.background.dirty = 1
+        elif event.type == pygame.MOUSEWHEEL:
+            self.zoom(event.y)
+        elif (
+            event.type == pygame.MOUSEBUTTONDOWN and event.button == 1
+            and self.minimap.rect.collidepoint(event.pos)
+        ):
+            self.board_group.center_on(self.minimap.tile_at(event.pos))
+        elif self.placing and event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                self.editor.pick(event.pos)
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+                self.editor.rotate()
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                self.editor.drop(event.pos)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            ox, oy = self.board_group.get_offset()
+            mx, my = event.pos
+            ts = self.board_group.tile_size
+            tile = ((mx - ox) // ts, (my - oy) // ts)
+            w, h = self.firegrid.size
+            if 0 <= tile[0] < w and 0 <= tile[1] < h:
+                center = ((tile[0] + 0.5) * TILE_SIZE, (tile[1] + 0.5) * TILE_SIZE)
+                if not self.firegrid.shoot(tile):
+                    self.sounds.play('miss')
+                    self.particles.emit('splash', center)
+                elif self.firegrid.sunk(self.ship_group.ship_tiles[tile]):
+                    self.sounds.play('sink')
+                    self.particles.emit('explosion', center, scale=3)
+                    self.particles.emit('smoke', center, scale=2)
+                else:
+                    self.sounds.play('hit')
+                    self.particles.emit('explosion', center)
+                    self.particles.emit('smoke', center)
+
+    def layout(self, size: Tuple[int, int]) -> None:
+        self.background.dirty = 1
+
+    def seed(self, seed: int) -> None:
+        self.particles.seed(seed)
+
+    def zoom(self, steps: int) -> None:
+        '''
+        Zooms in (positive `steps`) or out by that many of `ZOOM_LEVELS`, as far as the board
+        still covers the window.
+        '''
+        sw, sh = pygame.display.get_surface().get_size()
+        w, h = self.firegrid.size
+        levels = [ts for ts in ZOOM_LEVELS if ts * w >= sw and ts * h >= sh]
+        if not levels:
+            return
+        # A zoom still gliding is cut short; the board is at its target already
+        if self.zooming:
+            self.zoom_anim.cancel()
+            self.end_zoom()
+        start = self.board_group.tile_size
+        nearest = min(levels, key=lambda ts: abs(ts - start))
+        i = min(max(levels.index(nearest) - steps, 0), len(levels) - 1)
+        target = levels[i]
+        if target == start:
+            return
+        anchor = pygame.mouse.get_pos()
+        # Scaling the smaller level's frame up always covers the window
+        base = min(start, target)
+        self.board_group.set_tile_size(base, anchor)
+        self.firegrid.refresh()
+        self.editor.update()
+        view = pygame.Surface((sw, sh))
+        view.blits([
+            (spr.image, spr.rect) for spr in self.board_group.sprites()
+            if getattr(spr, 'visible', 1)
+        ], doreturn=False)
+        # Every frame of the glide is made now, so drawing one is a plain blit. Only the
+        # part of the view that lands in the window is scaled, and none of it is kept
+        # after the zoom.
+        sizes = range(start, target, ZOOM_STEP if target > start else -ZOOM_STEP)[1:]
+        ax, ay = anchor
+        self.zoom_frames = []
+        for ts in sizes:
+            scale = ts / base
+            area = pygame.Rect(
+                round(ax - ax / scale), round(ay - ay / scale),
+                round(sw / scale), round(sh / scale)
+            ).clip(view.get_rect())
+            frame = track(pygame.Surface((sw, sh)), self)
+            pygame.transform.scale(view.subsurface(area), (sw, sh), frame)
+            self.zoom_frames.append(frame)
+        # The target level is built now, before the first frame of the glide
+        self.board_group.set_tile_size(target, anchor)
+        self.crosshair.set_tile_size(target)
+        self.zoom_index = -1
+        self.zooming = True
+        self.zoom_anim = schedule(self.zoom_step)
+
+    def zoom_step(self, ticks: int) -> Optional[int]:
+        # Shows the next in-between frame, ZOOM_STEP pixels closer to the target
+        self.zoom_index += 1
+        if self.zoom_index >= len(self.zoom_frames):
+            self.end_zoom()
+            return None
+        return ZOOM_STEP_MS
+
+    def end_zoom(self) -> None:
+        '''
+        Goes back to drawing the board itself, now at the level zoomed to.
+        '''
+        self.zooming = False
+        self.zoom_frames = []
+        screen = pygame.display.get_surface()
+        self.render_group.repaint_rect(screen.get_rect())
+        if self.compositor is not None:
+            # Otherwise the frame from before the zoom would be shown once more
+            self.compositor.wait()
+            self.submit_board(screen.get_size())
+
+    def fixed_update(self, dt: float) -> None:
+        self.board_group.update(dt=dt)
+
+    def update(self) -> None:
+        self.board_group.interpolate(self.gameloop.timestep.alpha)
+        self.editor.update()
+        self.firegrid.refresh()
+        self.ui_group.update(offset=self.board_group.get_offset())
+        self.particles.update(self.gameloop.dt)
+
+    def render(self, screen: pygame.Surface) -> List[pygame.Rect]:
+        if self.zooming:
+            return self.render_zoom(screen)
+        if self.compositor is not None:
+            return self.render_composed(screen)
+        # Particles are drawn over the sprites, so last frame's have to be painted over first
+        if self.particles.bounds is not None:
+            self.render_group.repaint_rect(self.particles.bounds)
+        dirty_rects = self.render_group.draw(screen)
+        return dirty_rects + self.particles.draw(
+            screen, self.board_group.get_offset(), self.board_group.tile_size / TILE_SIZE
+        )
+
+    def render_zoom(self, screen: pygame.Surface) -> List[pygame.Rect]:
+        screen.blit(self.zoom_frames[self.zoom_index], (0, 0))
+        self.ui_group.repaint_rect(screen.get_rect())
+        self.ui_group.draw(screen)
+        return [screen.get_rect()]
+
+    def submit_board(self, size: Tuple[int, int]) -> None:
+        self.compositor.submit(size)
+        self.compose_pending = True
+        for spr in self.board_group:
+            if spr.dirty == 1:
+                spr.dirty = 0
+
+    def render_composed(self, screen: pygame.Surface) -> List[pygame.Rect]:
+        # The board frame submitted last time is shown now (as the UI's background), and the
+        # next one is composed while the main thread gets on with the next frame
+        composed = self.compositor.wait()
+        if self.compose_pending and composed is not None:
+            self.render_group.repaint_rect(screen.get_rect())
+        elif self.particles.bounds is not None:
+            self.render_group.repaint_rect(self.particles.bounds)
+        self.compose_pending = False
+        if (
+            any(spr.dirty for spr in self.board_group)
+            or composed is None or composed.get_size() != screen.get_size()
+        ):
+            self.submit_board(screen.get_size())
+        dirty_rects = self.render_group.draw(screen, composed)
+        return dirty_rects + self.particles.draw(
+            screen, self.board_group.get_offset(), self.board_group.tile_size / TILE_SIZE
+        )
+
+    def close(self) -> None:
+        if self.compositor is not None:
+            self.compositor.close()
+
 class GameLoop:
-    scenedict = {
-        'menu_main': MainMenu,
-        'menu_story': StoryMenu,
-        'menu_freeplay': FreeplayMenu,
-        'menu_multiplayer': MultiplayerMenu,
-        'menu_options': OptionsMenu,
+    # Scenes can be registered lazily as 'module:Class' strings (relative to this package);
+    # the module is only imported when the scene is first used.
+    scenedict: Dict[str, Union[Type[Scene], str]] = {
+        'menu_main': '.menus:MainMenu',
+        'menu_story': '.menus:StoryMenu',
+        'menu_freeplay': '.menus:FreeplayMenu',
+        'menu_multiplayer': '.menus:MultiplayerMenu',
+        'menu_options': '.menus:OptionsMenu',
         'game_story': StoryGame,
         'game_freeplay': FreeplayGame,
         'game_multiplayer': MultiplayerGame,
+        'demo_board': BoardDemo,
     }
 
-    def __init__(self, init_scene: str, size: Tuple[int, int]) -> None:
+    def __init__(
+        self,
+        init_scene: str,
+        size: Tuple[int, int],
+        fps: int=60,
+        idle_fps: int=4,
+        adaptive: bool=True,
+        threaded_compose: Optional[bool]=None,
+        scaled: Optional[bool]=None,
+        options: Optional[GameOptions]=None
+    ) -> None:
         self.running = False
-        self.screen = pygame.display.set_mode(size, flags=pygame.RESIZABLE)
-        self.current_scene: Scene = GameLoop.scenedict[init_scene](self)
+        # Scaled: scenes are laid out once for `size`, and SDL scales each presented frame
+        # to the window (on the GPU where it can), so resizing costs nothing
+        if scaled is None:
+            scaled = os.environ.get('WWII_SCALED', '0') not in ('', '0')
+        self.scaled = scaled
+        # Scenes that support it compose their heavy layers on a worker thread (compositor.py)
+        if threaded_compose is None:
+            threaded_compose = os.environ.get('WWII_THREADED_COMPOSE', '0') not in ('', '0')
+        self.threaded_compose = threaded_compose
+        try:
+            self.screen = pygame.display.set_mode(
+                size, flags=pygame.RESIZABLE | (pygame.SCALED if scaled else 0)
+            )
+        except pygame.error as e:
+            # SCALED needs an SDL renderer, which some video drivers (e.g. dummy) lack
+            if not scaled:
+                raise
+            print('Scaled rendering unavailable, rendering at window size:', e)
+            self.scaled = False
+            self.screen = pygame.display.set_mode(size, flags=pygame.RESIZABLE)
+        # Live: someone is playing, so there's music and edits to the options file are picked
+        # up. Headless runs aren't, and neither are replays (InputReplayer turns this off).
+        self.live = pygame.display.get_driver() not in HEADLESS_DRIVERS
+        # Seed for the scenes' random effects; set by InputRecorder/InputReplayer
+        self.seed: Optional[int] = None
+        # Created on first use, so runs that never touch them don't pay for them
+        self._options = options
+        self._music: Optional[MusicPlayer] = None
+        self._sounds: Optional[SoundBank] = None
+        self.surfaces = SurfaceTracker.from_env()
+        self.surfaces.install()
+        self.surfaces.scene = self.scene_name = init_scene
+        self.timeline = Timeline()
+        self.timeline.install()
+        self.current_scene: Scene = self.load_scene(init_scene)(self)
         self.clock = pygame.time.Clock()
+        self.timestep = FixedTimestep(1 / fps)
+        self.dt = 0.0
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.adaptive = adaptive
+        self.idle = False
+        self._caption = ''
+        self.stats = FrameStats()
+        self.latency = LatencyTracker()
+        self.latency.install()
+        self.overlay = PerfOverlay(self.stats, latency=self.latency, surfaces=self.surfaces)
+        self.debug_keys: Dict[int, Callable[[], None]] = {
+            pygame.K_F3: self.toggle_overlay,
+            pygame.K_F4: self.dump_stats,
+        }
+        self.profiler = FrameProfiler.from_env()
+        self.debug_keys[pygame.K_F9] = self.profiler.toggle
+        self.capture = FrameCapture.from_env()
+        self.debug_keys[pygame.K_F10] = self.capture.toggle
+        # InputRecorder/InputReplayer from replay.py hook in here
+        self.input_hook: Optional[Any] = None
+        # Event types carrying network messages (`msg`) for the scene; see NetworkService
+        self.message_events: Set[int] = set()
+
+    @property
+    def options(self) -> GameOptions:
+        '''
+        The player's options. Unless they were passed in, they're loaded on first use, and
+        watched for edits if the loop is `live`.
+        '''
+        if self._options is None:
+            self._options = GameOptions(write_behind=True)
+            if self.live:
+                self._options.watch()
+        return self._options
+
+    @property
+    def music(self) -> MusicPlayer:
+        if self._music is None:
+            self._music = MusicPlayer(self.options)
+        return self._music
+
+    @property
+    def sounds(self) -> SoundBank:
+        if self._sounds is None:
+            self._sounds = SoundBank(self.options)
+        return self._sounds
+
+    def set_seed(self, seed: int) -> None:
+        '''
+        Seeds the current scene's random effects, and those of every scene started after.
+        '''
+        self.seed = seed
+        self.current_scene.seed(seed)
+
+    def start_music(self) -> None:
+        '''
+        Starts the current scene's music, if the loop is `live`. Called when the loop starts.
+        '''
+        if self.live:
+            self.music.play(self.current_scene.music_track)
+
+    @classmethod
+    def register_scene(cls, name: str, scene: Union[Type[Scene], str]) -> None:
+        '''
+        Adds a scene, either as a class or as a lazy `'module:Class'` string.
+        '''
+        cls.scenedict[name] = scene
+
+    @classmethod
+    def load_scene(cls, name: str) -> Type[Scene]:
+        '''
+        Returns the scene class registered as `name`, importing its module if needed.
+        '''
+        scene = cls.scenedict[name]
+        if isinstance(scene, str):
+            module_name, class_name = scene.split(':')
+            scene = getattr(importlib.import_module(module_name, __package__), class_name)
+            cls.scenedict[name] = scene
+        return scene
+
+    def get_events(self) -> List[pygame.event.Event]:
+        '''
+        Pumps the event queue. If the last frame was idle (nothing drawn, no input), this
+        blocks until an event arrives or the idle frame time passes, so static scenes
+        don't spin the CPU at full frame rate.
+        '''
+        if not self.idle:
+            return pygame.event.get()
+        timeout = 1000 // max(self.idle_fps, 1)
+        # Wake up in time for the next animation frame, too
+        due = self.timeline.next_due()
+        if due is not None:
+            timeout = min(timeout, max(due - pygame.time.get_ticks(), 1))
+        event = pygame.event.wait(timeout)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def update_caption(self) -> None:
+        '''
+        Sets the window caption, but only calls into the display when the text changes.
+        '''
+        fps = self.clock.get_fps()
+        # Unthrottled sub-millisecond frames (replays with fps=0) measure as infinite
+        shown = round(fps) if isfinite(fps) else 0
+        caption = f'{self.current_scene.caption} (FPS: {shown})'
+        if caption != self._caption:
+            pygame.display.set_caption(caption)
+            self._caption = caption
+
+    def toggle_overlay(self) -> None:
+        repaint = self.overlay.toggle()
+        if repaint is not None:
+            self.current_scene.render_group.repaint_rect(repaint)
+
+    def dump_stats(self) -> None:
+        path = self.stats.dump_csv(time.strftime('perf_%Y%m%d_%H%M%S.csv'))
+        print('Frame stats written to', path)
+        print(self.latency.report())
+        print(self.surfaces.report())
+
+    def step(self, events: List[pygame.event.Event]) -> None:
+        '''
+        Runs one frame: dispatches `events`, simulates, renders and updates the display.
+        '''
+        stats = self.stats
+        t = perf_counter()
+        self.latency.stamp(events, t)
+        for event in events:
+            if event.type == pygame.QUIT: # Catch window close events
+                self.running = False
+            elif event.type == pygame.KEYDOWN and event.key in self.debug_keys:
+                self.debug_keys[event.key]()
+            elif self._music is not None and event.type == self._music.end_event:
+                self._music.handle_event(event)
+            elif event.type in self.message_events:
+                self.current_scene.handle_message(event.msg)
+            elif event.type == pygame.VIDEORESIZE:
+                if not self.scaled:
+                    self.current_scene.layout(self.screen.get_size())
+            else:
+                self.current_scene.handle_event(event)
+        t = stats.lap('handle_event', t)
+        for _ in range(self.timestep.advance(self.dt)):
+            self.current_scene.fixed_update(self.timestep.step)
+        t = stats.lap('fixed_update', t)
+        self.timeline.advance()
+        self.current_scene.update()
+        if self._music is not None:
+            self._music.update(self.dt)
+        t = stats.lap('update', t)
+        dirty_rects = self.current_scene.render(self.screen) or []
+        update_rects = dirty_rects + self.overlay.draw(self.screen)
+        t = stats.lap('render', t)
+        if update_rects:
+            pygame.display.update(update_rects)
+            stats.count_rects(update_rects)
+        t = stats.lap('display', t)
+        self.latency.presented(t)
+        if self.capture.active:
+            # Counted as display time, since it's part of getting the frame out
+            self.capture.frame(self.screen, update_rects)
+            stats.lap('display', t)
+        # Drop to the idle rate only when nothing happened this frame;
+        # any input or animation (a dirty sprite or a music fade) brings us right back
+        self.idle = (
+            self.adaptive and not events and not dirty_rects
+            and not (self._music is not None and self._music.fading)
+        )
 
     def run(self) -> None:
         self.running = True
+        self.start_music()
         while self.running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: # Catch window close events
-                    self.running = False
-                else:
-                    self.current_scene.handle_event(event)
-            self.current_scene.update()
-            pygame.display.update(self.current_scene.render(self.screen))
-            self.clock.tick(60)
-            pygame.display.set_caption(
-                f'{self.current_scene.caption} (FPS: {self.clock.get_fps()})'
-            )
+            t = perf_counter()
+            events = self.get_events()
+            if self.input_hook is not None:
+                events = self.input_hook.process(self, events)
+            # While idle, get_events() is mostly waiting, not pumping
+            self.stats.lap('sleep' if self.idle else 'pump', t)
+            self.step(events)
+            t = perf_counter()
+            self.dt = self.clock.tick(self.fps) / 1000
+            self.stats.lap('sleep', t)
+            self.stats.end_frame()
+            if self.profiler.active:
+                self.profiler.frame_done()
+            self.update_caption()
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        '''
+        Closes the current scene and finishes the profile and capture, if they're running.
+        Called when the loop exits.
+        '''
+        self.current_scene.close()
+        self.profiler.stop()
+        self.capture.stop()
 
     def change_scene(self, scene: str):
-        self.current_scene = GameLoop.scenedict[scene](self)
+        self.surfaces.scene = self.scene_name = scene
+        # The old scene's animations go with it
+        self.timeline.clear()
+        self.current_scene.close()
+        self.current_scene = self.load_scene(scene)(self)
+        if self.seed is not None:
+            self.current_scene.seed(self.seed)
+        if self._music is not None and self.current_scene.music_track is not None:
+            self._music.switch(self.current_scene.music_track)
 
 if __name__ == '__main__':
-
-    #General setup
     pygame.init()
-    clock = pygame.time.Clock()
-
-    #Game Screen
-    screen_width = 800
-    screen_height = 600
-    screen = pygame.display.set_mode((screen_width,screen_height), flags=pygame.RESIZABLE)
-    background = TiledBackground('ocean.png', (30, 30))
-    #bg = pygame.transform.scale(background, (800,600))
-
-    base_vel = 3
-    shift_vel = 5
-
-    board_group = ScrollingGroup(background, base_velocity=base_vel)
-    overlay_grid = OverlayGrid((0, 0), (30, 30), board_group)
-    overlay_grid.visible = 0
-
-    ui_group = pygame.sprite.LayeredDirty()
-    
-
-    #Ships
-
-    ship_group = ShipGroup()
-    s1 = Ship((0, 0), 'essex.png', board_group, ship_group)
-    s2 = Ship((5, 1), 'essex.png', board_group, ship_group)
-    s3 = Ship((10, 0), 'essex.png', board_group, ship_group)
-    s4 = Ship((15, 1), 'essex.png', board_group, ship_group)
-    s5 = Ship((20, 0), 'essex.png', board_group, ship_group)
-
-    firegrid = FiringGrid((30, 30), ShotStyle.CLEAN, ship_group, board_group)
-    print(firegrid.shoot((0, 0)))
-    print(firegrid.shoot((1, 1)))
-
-    #Crosshair
-    crosshair = SnapCrosshair(pygame.Color('Black'), ui_group)
-
-    # pygame.mouse.set_visible(False) # hide the mouse for the crosshair
-
-    running = True
-
-    render_group = pygame.sprite.LayeredDirty(*board_group, *ui_group)
-
-    MOVEMENT_KEYS: Final[List[int]] = [
-        pygame.K_w, pygame.K_UP,
-        pygame.K_a, pygame.K_LEFT,
-        pygame.K_s, pygame.K_DOWN,
-        pygame.K_d, pygame.K_RIGHT,
-    ]
-
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    running = False
-                if event.key in (pygame.K_LSHIFT, pygame.K_RSHIFT):
-                    overlay_grid.visible = 1
-                    crosshair.dirty = 1
-                    board_group.base_velocity = shift_vel
-                    board_group.vel_dirty = True
-                    board_group.keys_dirty = True
-                if event.key in MOVEMENT_KEYS:
-                    board_group.keys_dirty = True
-            if event.type == pygame.KEYUP:
-                if event.key in (pygame.K_LSHIFT, pygame.K_RSHIFT):
-                    overlay_grid.visible = 0
-                    crosshair.dirty = 1
-                    board_group.base_velocity = base_vel
-                    board_group.vel_dirty = True
-                    board_group.keys_dirty = True
-                if event.key in MOVEMENT_KEYS:
-                    board_group.keys_dirty = True
-            if event.type == pygame.MOUSEMOTION:
-                crosshair.dirty = 1
-                background.dirty = 1
-            if event.type == pygame.VIDEORESIZE:
-                background.dirty = 1
-
-
-        board_group.update()
-
-        ui_group.update(offset=board_group.get_offset())
-
-        pygame.display.update(render_group.draw(screen) + ui_group.draw(screen))
-
-        
-        pygame.display.set_caption(f'gamemodels test (fps: {clock.get_fps()})')
-
-        clock.tick(60)
+    GameLoop('demo_board', (800, 600)).run()
@@ -0,0 +1,114 @@
+# WWII Pacific Front - latency.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Input-to-display latency measurement.
+
+`GameLoop` stamps input events as they are pumped. Sprites call `note_effect()` when an
+input visibly changes them (the crosshair snapping to a new tile, a button swapping to its
+hover image, a shot marker appearing). When the frame containing that change is sent to the
+display, the time since the input was pumped is recorded for its kind of input.
+
+Kinds:
+- `'pointer'`: mouse motion (crosshair moves, button hover)
+- `'click'`: mouse buttons (shots, button presses)
+- `'key'`: keyboard (board scrolling, text input)
+'''
+
+from time import perf_counter
+from typing import Dict, Final, Iterable, List, Optional, Sequence
+
+import pygame
+import pygame.event
+
+from .misc_utils import RingBuffer
+
+KINDS: Final = ('pointer', 'click', 'key')
+
+_EVENT_KINDS: Final[Dict[int, str]] = {
+    pygame.MOUSEMOTION: 'pointer',
+    pygame.MOUSEBUTTONDOWN: 'click',
+    pygame.MOUSEBUTTONUP: 'click',
+    pygame.KEYDOWN: 'key',
+    pygame.KEYUP: 'key',
+    pygame.TEXTINPUT: 'key',
+}
+
+_active: Optional['LatencyTracker'] = None
+
+
+def note_effect(kind: str) -> None:
+    '''
+    Tells the active `LatencyTracker` (if any) that input of this kind changed what will be
+    drawn this frame. Cheap enough to call from `update()` methods.
+    '''
+    if _active is not None:
+        _active.effects.add(kind)
+
+
+class LatencyTracker:
+    '''
+    Matches pumped input to the frame that first shows its effect.
+
+    Input that hasn't had a visible effect after `max_frames` presented frames is dropped
+    (moving the mouse within one tile doesn't move the crosshair), so it doesn't inflate
+    the next measurement.
+    '''
+    def __init__(self, history: int=600, max_frames: int=4) -> None:
+        self.samples: Dict[str, RingBuffer] = {k: RingBuffer(history) for k in KINDS}
+        self.max_frames = max_frames
+        self.effects = set()
+        # kind -> [pump time of the oldest unanswered input, frames it has waited]
+        self._pending: Dict[str, List[float]] = {}
+
+    def install(self) -> None:
+        '''
+        Makes this the tracker `note_effect()` reports to.
+        '''
+        global _active
+        _active = self
+
+    def stamp(self, events: Iterable[pygame.event.Event], now: Optional[float]=None) -> None:
+        '''
+        Records when a batch of events was pumped.
+        '''
+        if now is None:
+            now = perf_counter()
+        for event in events:
+            kind = _EVENT_KINDS.get(event.type)
+            if kind is not None and kind not in self._pending:
+                self._pending[kind] = [now, 0]
+
+    def presented(self, now: Optional[float]=None) -> None:
+        '''
+        Called right after `pygame.display.update()`.
+        '''
+        if now is None:
+            now = perf_counter()
+        for kind in self.effects:
+            pending = self._pending.pop(kind, None)
+            if pending is not None:
+                self.samples[kind].append(now - pending[0])
+        self.effects.clear()
+
+        for kind in list(self._pending):
+            pending = self._pending[kind]
+            pending[1] += 1
+            if pending[1] >= self.max_frames:
+                del self._pending[kind]
+
+    def percentiles(self, kind: str, pcts: Sequence[float]=(50, 95, 99)) -> List[float]:
+        '''
+        Returns the given latency percentiles for a kind of input, in milliseconds.
+        '''
+        buf = self.samples[kind]
+        return [buf.percentile(p) * 1000 for p in pcts]
+
+    def report(self) -> str:
+        lines = [f'{"latency":<14}{"p50":>8}{"p95":>8}{"p99":>8}  (ms, n)']
+        for kind in KINDS:
+            if len(self.samples[kind]):
+                p50, p95, p99 = self.percentiles(kind)
+                lines.append(
+                    f'{kind:<14}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}  {len(self.samples[kind])}'
+                )
+        return '\n'.join(lines)
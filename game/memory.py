@@ -0,0 +1,121 @@
+# WWII Pacific Front - memory.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Surface memory accounting.
+
+Sprites pass the surfaces they keep to `track()`, which attributes the surface's pixel
+buffer to the current scene and the sprite's class. The bytes are released automatically
+when the surface is garbage collected. If the live total goes over the budget, a
+`MemoryBudgetWarning` is issued.
+
+The budget can be set with the `WWII_SURFACE_BUDGET_MB` environment variable.
+'''
+
+import os
+import warnings
+import weakref
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, Optional, Tuple
+
+import pygame
+
+
+class MemoryBudgetWarning(Warning):
+    '''
+    Issued when live tracked surfaces take up more memory than the budget allows.
+    '''
+
+
+_active: Optional['SurfaceTracker'] = None
+
+
+def track(surface: pygame.Surface, owner: Any=None) -> pygame.Surface:
+    '''
+    Attributes `surface` to `owner` (usually the sprite keeping it) with the active
+    `SurfaceTracker`, if there is one. Returns `surface`, so it can wrap an assignment:
+    ```py
+    self.image = track(pygame.Surface(size), self)
+    ```
+    '''
+    if _active is not None:
+        _active.track(surface, owner)
+    return surface
+
+
+def surface_bytes(surface: pygame.Surface) -> int:
+    '''
+    Size of a surface's pixel buffer. Subsurfaces share their parent's pixels, so they're 0.
+    '''
+    if surface.get_parent() is not None:
+        return 0
+    return surface.get_pitch() * surface.get_height()
+
+
+class SurfaceTracker:
+    def __init__(self, budget: Optional[int]=None) -> None:
+        self.budget = budget
+        self.scene = '<no scene>'
+        self.total = 0
+        self.by_scene: DefaultDict[str, int] = defaultdict(int)
+        self.by_owner: DefaultDict[Tuple[str, str], int] = defaultdict(int)
+        self._tracked: Dict[int, weakref.finalize] = {}
+        self._over_budget = False
+
+    @classmethod
+    def from_env(cls) -> 'SurfaceTracker':
+        budget_mb = os.environ.get('WWII_SURFACE_BUDGET_MB')
+        return cls(int(float(budget_mb) * 1024 * 1024) if budget_mb else None)
+
+    def install(self) -> None:
+        '''
+        Makes this the tracker `track()` reports to.
+        '''
+        global _active
+        _active = self
+
+    def track(self, surface: pygame.Surface, owner: Any=None) -> None:
+        if id(surface) in self._tracked:
+            return
+        size = surface_bytes(surface)
+        owner_name = type(owner).__name__ if owner is not None else '<unowned>'
+        key = (self.scene, owner_name)
+        self.total += size
+        self.by_scene[self.scene] += size
+        self.by_owner[key] += size
+        self._tracked[id(surface)] = weakref.finalize(
+            surface, self._release, id(surface), key, size
+        )
+        self._check_budget()
+
+    def _release(self, surf_id: int, key: Tuple[str, str], size: int) -> None:
+        del self._tracked[surf_id]
+        self.total -= size
+        self.by_scene[key[0]] -= size
+        self.by_owner[key] -= size
+        if not self.by_owner[key]:
+            del self.by_owner[key]
+        if not self.by_scene[key[0]]:
+            del self.by_scene[key[0]]
+        if self.budget is not None and self.total <= self.budget:
+            self._over_budget = False
+
+    def _check_budget(self) -> None:
+        # Only warn when crossing the budget, not on every allocation past it
+        if self.budget is None or self.total <= self.budget or self._over_budget:
+            return
+        self._over_budget = True
+        warnings.warn(
+            f'Tracked surfaces use {self.total / 2**20:.1f} MiB, over the budget of '
+            f'{self.budget / 2**20:.1f} MiB\n{self.report()}',
+            MemoryBudgetWarning,
+            stacklevel=4,
+        )
+
+    def report(self) -> str:
+        lines = [f'Surface memory: {self.total / 2**20:.2f} MiB']
+        for scene, scene_total in sorted(self.by_scene.items(), key=lambda i: -i[1]):
+            lines.append(f'  {scene}: {scene_total / 2**20:.2f} MiB')
+            owners = [(o, b) for (s, o), b in self.by_owner.items() if s == scene]
+            for owner, owner_total in sorted(owners, key=lambda i: -i[1]):
+                lines.append(f'    {owner}: {owner_total / 2**10:.0f} KiB')
+        return '\n'.join(lines)
@@ -0,0 +1,169 @@
+# WWII Pacific Front - menus.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+This module defines the menu scenes. `GameLoop` imports it the first time a menu scene
+is needed, so only the scenes actually shown are loaded.
+'''
+
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Tuple
+
+import pygame
+import pygame.freetype
+
+from .gamemodels import Background, Button, Scene, TextInput
+
+if TYPE_CHECKING:
+    from .gamemodels import GameLoop
+
+class MainMenu(Scene):
+    def __init__(self, gameloop: 'GameLoop') -> None:
+        super().__init__(gameloop, 'WWIIL: Pacific Front')
+        ssize = gameloop.screen.get_rect().size
+        self.bg = Background('menubg.png', ssize, self.render_group)
+        self.gameloop = gameloop
+        self.font = pygame.freetype.Font(
+            Path(__file__).parent.parent / 'assets' / 'font' / 'CutiveMono-Regular.ttf', 48
+        )
+        brect = pygame.Rect(0, 0, 200, 50)
+        self.buttons = pygame.sprite.Group()
+        self.storybutton = Button(
+            brect,
+            'Story',
+            self.font,
+            pygame.Color('White'),
+            pygame.Color('Navy'),
+            lambda: gameloop.change_scene('menu_story'),
+            self.render_group, self.buttons
+        )
+        self.freeplaybutton = Button(
+            brect.copy(),
+            'Freeplay',
+            self.font,
+            pygame.Color('White'),
+            pygame.Color('Mediumblue'),
+            lambda: gameloop.change_scene('menu_freeplay'),
+            self.render_group, self.buttons
+        )
+        self.multiplayerbutton = Button(
+            brect.copy(),
+            'Multiplayer',
+            self.font,
+            pygame.Color('White'),
+            pygame.Color('Red'),
+            lambda: gameloop.change_scene('menu_multiplayer'),
+            self.render_group, self.buttons
+        )
+        self.optionsbutton = Button(
+            brect.copy(),
+            'Options',
+            self.font,
+            pygame.Color('Black'),
+            pygame.Color('White'),
+            lambda: gameloop.change_scene('menu_options'),
+            self.render_group, self.buttons
+        )
+        self.layout(ssize)
+    
+    def layout(self, size: Tuple[int, int]) -> None:
+        self.bg.resize(size)
+        frect = self.font.get_rect('WWII: Pacific Front')
+        frect.right = size[0] * 14 // 15
+        frect.bottom = size[1] // 8
+        titlepos = frect.topleft
+        self.font.render_to(self.bg.image, titlepos, 'WWII: Pacific Front', pygame.Color('Black'))
+        brect = pygame.Rect(size[0] // 15, size[1] // 5 + 50, 200, 50)
+        self.storybutton.rect = brect
+        self.freeplaybutton.rect = brect.move(250, 0)
+        self.multiplayerbutton.rect = brect.move(0, 75)
+        self.optionsbutton.rect = brect.move(250, 75)
+        self.bg.dirty = 1
+
+    def update(self) -> None:
+        self.buttons.update()
+    
+    def render(self, screen: pygame.Surface) -> List[pygame.Rect]:
+        return self.render_group.draw(screen)
+
+    def handle_event(self, event: pygame.event.Event) -> None:
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.gameloop.running = False
+
+class StoryMenu(Scene):
+    def __init__(self, gameloop: 'GameLoop') -> None:
+        super().__init__(gameloop, 'WWII: Pacific Front - Story')
+        ssize = gameloop.screen.get_rect().size
+        self.bg = Background('menubg.png', ssize, self.render_group)
+        self.bg.base_image.fill(pygame.Color('#404040'), special_flags=pygame.BLEND_SUB)
+
+        self.gameloop = gameloop
+        self.font = pygame.freetype.Font(
+            Path(__file__).parent.parent / 'assets' / 'font' / 'CutiveMono-Regular.ttf', 48
+        )
+        brect = pygame.Rect(0, 0, 200, 50)
+        self.buttons = pygame.sprite.Group()
+        self.startbutton = Button(
+            brect,
+            'Begin',
+            self.font,
+            pygame.Color('White'),
+            pygame.Color('Navy'),
+            lambda: gameloop.change_scene('menu_story'),
+            self.render_group, self.buttons
+        )
+        self.backbutton = Button(
+            brect.copy(),
+            'Back',
+            self.font,
+            pygame.Color('Black'),
+            pygame.Color('White'),
+            lambda: gameloop.change_scene('menu_main'),
+            self.render_group, self.buttons
+        )
+        self.nameinput = TextInput(
+            pygame.Rect(0, 0, 500, 50),
+            self.font,
+            pygame.Color('Black'),
+            pygame.Color('White'),
+            self.render_group,
+            text_size=24
+        )
+        self.layout(ssize)
+
+    def layout(self, size: Tuple[int, int]) -> None:
+        self.bg.resize(size)
+        frect = self.font.get_rect('Story')
+        frect.centerx = size[0] // 2
+        frect.top = 20
+        self.bg.image.fill(pygame.Color('Gray16'), pygame.Rect(0, 0, size[0], frect.bottom + 20))
+        titlepos = frect.topleft
+        self.font.render_to(self.bg.image, titlepos, 'Story', pygame.Color('White'))
+        brect = pygame.Rect(0, size[1] - 100, 200, 50)
+        brect.right = size[0] // 2 - 25
+        self.startbutton.rect = brect
+        self.backbutton.rect = brect.move(250, 0)
+        self.nameinput.rect.center = self.bg.rect.center
+        self.bg.dirty = 1
+
+    def update(self) -> None:
+        self.buttons.update()
+        self.nameinput.update()
+
+    def render(self, screen: pygame.Surface) -> List[pygame.Rect]:
+        return self.render_group.draw(screen)
+
+    def handle_event(self, event: pygame.event.Event) -> None:
+        self.nameinput.handle_event(event)
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.gameloop.change_scene('menu_main')
+
+class FreeplayMenu(Scene):
+    pass
+
+class MultiplayerMenu(Scene):
+    pass
+
+class OptionsMenu(Scene):
+    pass
@@ -4,9 +4,93 @@
 Miscellaneous utilities for general Python.
 '''
 
+from math import ceil
+
 class TypeWarning(Warning):
     '''
     Issued when a type is not valid for the argument, but will be ignored.
 
     Basically the warning version of TypeError.
     '''
+
+
+class RingBuffer:
+    '''
+    A fixed-size buffer of numbers. Once full, each `append()` overwrites the oldest entry,
+    so appending is O(1) and the buffer never reallocates.
+
+    Keeps a running total, so `mean()` is O(1) as well.
+    '''
+    def __init__(self, size: int) -> None:
+        if size <= 0:
+            raise ValueError('RingBuffer size must be positive')
+        self._data = [0.0] * size
+        self._size = size
+        self._index = 0
+        self._count = 0
+        self._total = 0.0
+
+    def append(self, value: float) -> None:
+        '''
+        Adds a value, overwriting the oldest one if the buffer is full.
+        '''
+        if self._count == self._size:
+            self._total -= self._data[self._index]
+        else:
+            self._count += 1
+        self._data[self._index] = value
+        self._total += value
+        self._index = (self._index + 1) % self._size
+
+    def clear(self) -> None:
+        '''
+        Empties the buffer without reallocating it.
+        '''
+        self._index = 0
+        self._count = 0
+        self._total = 0.0
+
+    @property
+    def size(self) -> int:
+        '''
+        The maximum number of values this buffer holds.
+        '''
+        return self._size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        '''
+        Iterates from the oldest value to the newest.
+        '''
+        start = (self._index - self._count) % self._size
+        for i in range(self._count):
+            yield self._data[(start + i) % self._size]
+
+    def last(self, default: float=0.0) -> float:
+        '''
+        Returns the most recently appended value, or `default` if the buffer is empty.
+        '''
+        if self._count == 0:
+            return default
+        return self._data[self._index - 1]
+
+    def total(self) -> float:
+        return self._total
+
+    def mean(self) -> float:
+        if self._count == 0:
+            return 0.0
+        return self._total / self._count
+
+    def percentile(self, pct: float) -> float:
+        '''
+        Returns the `pct`th percentile (0-100, nearest rank) of the values in the buffer.
+        This sorts a copy, so don't call it every frame on big buffers.
+        '''
+        if self._count == 0:
+            return 0.0
+        ordered = sorted(self)
+        rank = min(self._count - 1, max(0, ceil(pct / 100 * self._count) - 1))
+        return ordered[rank]
@@ -6,10 +6,15 @@ This module is responsible for multiplayer capabilities.
 '''
 
 import asyncio
-import json
-from typing import Any, MutableSequence, Optional
+import queue
+import random
+import threading
+from time import perf_counter
+from typing import (
+    Any, AsyncIterator, Callable, Coroutine, Dict, Iterable, List, MutableSequence, Optional,
+    Set, Tuple
+)
 
-import websockets
 import pygame
 import pygame.event
 import pygame.key
@@ -17,30 +22,227 @@ import pygame.display
 import pygame.freetype
 import pygame.sprite
 
+from .frames import CHANNELS, DEFAULT_CHANNEL, decode_frame, encode_frame
+from .gamemodels import GameLoop
 from .pygame_async_utils import AsyncClock
 
 
+class WSConnection:
+    '''
+    One websocket shared by every client of a server, carrying each client's messages on
+    its own channel. Received frames are sorted into a queue per channel.
+
+    A single reader task owns the socket. If the connection drops, it reconnects with
+    exponential backoff (with jitter, so clients don't all come back at once) and rejoins
+    every open channel, and sends wait until it's back, so clients never see the drop. The
+    backoff applies to drops too, so a server that accepts and hangs up right away isn't
+    hammered; it only resets once a connection has proven itself.
+    '''
+    _shared: Dict[Tuple[str, Any], 'WSConnection'] = {}
+
+    def __init__(
+        self,
+        uri: str,
+        ssl: Any=True,
+        min_backoff: float=0.5,
+        max_backoff: float=30.0,
+        stable_after: float=10.0
+    ) -> None:
+        self.uri = uri
+        self.ssl = ssl
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        # A connection up this long (or one that received a frame) resets the backoff
+        self.stable_after = stable_after
+        self.ws: Optional['websockets.ClientConnection'] = None
+        self.queues: Dict[str, 'asyncio.Queue[Optional[dict]]'] = {}
+        self.reconnects = 0
+        # Called with True when the connection comes up and False when it drops
+        self.on_status: List[Callable[[bool], None]] = []
+        self._connected: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @classmethod
+    def shared(cls, uri: str, ssl: Any=True) -> 'WSConnection':
+        '''
+        The connection to `uri` every client of it uses, created the first time it's asked for.
+        '''
+        conn = cls._shared.get((uri, ssl))
+        if conn is None:
+            conn = cls._shared[(uri, ssl)] = cls(uri, ssl)
+        return conn
+
+    def open(self, channel: str) -> 'asyncio.Queue[Optional[dict]]':
+        '''
+        Starts receiving `channel`, and returns its queue.
+        '''
+        queue = self.queues.get(channel)
+        if queue is None:
+            queue = self.queues[channel] = asyncio.Queue()
+            if self.ws is not None:
+                asyncio.ensure_future(self._send_raw(encode_frame(channel, 'join')))
+        return queue
+
+    async def start(self) -> None:
+        '''
+        Connects, if nothing has yet, and waits until the connection is up.
+        '''
+        if self._task is None:
+            self._closing = False
+            self._connected = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+        await self._connected.wait()
+
+    async def _run(self) -> None:
+        try:
+            await self._read_forever()
+        finally:
+            # Only ends when closed or cancelled; start() makes a new one after that
+            if self._task is asyncio.current_task():
+                self._task = None
+
+    async def _read_forever(self) -> None:
+        # Imported here so single-player never loads websockets
+        import websockets
+        delay = self.min_backoff
+        while not self._closing:
+            try:
+                ws = await websockets.connect(self.uri, ssl=self.ssl)
+            except Exception:
+                # Unreachable, refused, timed out, or even a malformed URI: keep retrying
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self.max_backoff)
+                continue
+            connected_at = perf_counter()
+            self.ws = ws
+            try:
+                for channel in list(self.queues):
+                    await ws.send(encode_frame(channel, 'join'))
+                self._connected.set()
+                for callback in self.on_status:
+                    callback(True)
+                async for raw in ws:
+                    try:
+                        channel, msg = decode_frame(raw)
+                    except ValueError as e:
+                        print('Ignoring malformed frame:', e)
+                        continue
+                    delay = self.min_backoff
+                    queue = self.queues.get(channel)
+                    if queue is not None:
+                        queue.put_nowait(msg)
+            except websockets.exceptions.ConnectionClosed:
+                pass
+            except Exception as e:
+                # Anything else takes this connection down, but not the reader
+                print('Websocket reader error:', repr(e))
+                await ws.close()
+            finally:
+                self._connected.clear()
+                self.ws = None
+                for callback in self.on_status:
+                    callback(False)
+            if self._closing:
+                break
+            self.reconnects += 1
+            if perf_counter() - connected_at >= self.stable_after:
+                delay = self.min_backoff
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, self.max_backoff)
+
+    async def _send_raw(self, raw: str) -> None:
+        import websockets
+        while True:
+            await self.start()
+            ws = self.ws
+            if ws is not None:
+                try:
+                    await ws.send(raw)
+                    return
+                except websockets.exceptions.ConnectionClosed:
+                    pass
+            # Dropped between the wait and the send; the reader task is reconnecting
+            await asyncio.sleep(0)
+
+    async def send(self, channel: str, msg_type: str, data: dict) -> None:
+        await self._send_raw(encode_frame(channel, msg_type, data))
+
+    async def recv(self, channel: str) -> Optional[dict]:
+        '''
+        The next message on `channel`, or None once the connection has been closed.
+        '''
+        queue = self.open(channel)
+        await self.start()
+        return await queue.get()
+
+    async def close(self) -> None:
+        self._closing = True
+        if self.ws is not None:
+            await self.ws.close()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for queue in self.queues.values():
+            queue.put_nowait(None)
+        WSConnection._shared.pop((self.uri, self.ssl), None)
+
+
 class WSClientMixin:
-    def __init__(self, *args, uri: str, ssl: Any, **kwargs) -> None:
-        self.ws = asyncio.get_event_loop().run_until_complete(websockets.connect(uri, ssl=ssl))
+    '''
+    Gives a class a channel on the shared websocket connection to `uri`. Connecting is
+    deferred to `connect()` (awaited by `run()`, `recv()` and `messages()`), so
+    constructing a client never blocks.
+    '''
+    def __init__(self, *args, uri: str, ssl: Any, channel: str=DEFAULT_CHANNEL, **kwargs) -> None:
+        self.uri = uri
+        self.ssl = ssl
+        self.channel = channel
+        self.conn = WSConnection.shared(uri, ssl)
+        self.conn.open(channel)
         super().__init__(*args, **kwargs)
 
+    async def connect(self) -> WSConnection:
+        await self.conn.start()
+        return self.conn
+
     async def send(self, msg_type: str, data: dict) -> None:
-        await self.ws.send(json.dumps({'type': msg_type, 'data': data}))
+        await self.conn.send(self.channel, msg_type, data)
+
+    async def recv(self) -> Optional[dict]:
+        return await self.conn.recv(self.channel)
+
+    async def messages(self) -> AsyncIterator[dict]:
+        '''
+        Yields received messages until the connection is closed.
+        '''
+        while True:
+            msg = await self.recv()
+            if msg is None:
+                return
+            yield msg
+
+    async def close(self) -> None:
+        '''
+        Closes the connection, for every client sharing it.
+        '''
+        await self.conn.close()
 
-    async def recv(self) -> dict:
-        return json.loads(await self.ws.recv())
-    
     async def client(self) -> None:
         pass
 
+    async def _connect_and_run(self) -> None:
+        await self.connect()
+        await self.client()
+
     def run(self) -> None:
-        asyncio.get_event_loop().run_until_complete(self.client())
+        asyncio.get_event_loop().run_until_complete(self._connect_and_run())
 
 
 class ChatClient(WSClientMixin):
     def __init__(self, uri: str='wss://wwiipacifront.trudev.tech/ws/chat/', ssl: Any=True) -> None:
-        super().__init__(uri=uri, ssl=ssl)
+        super().__init__(uri=uri, ssl=ssl, channel='chat')
 
     async def client(self) -> None:
         nick = input('Enter a Nickname: ')
@@ -56,8 +258,211 @@ class ChatClient(WSClientMixin):
             asyncio.get_event_loop().run_forever()
         except KeyboardInterrupt:
             print('Closing Socket...')
-            asyncio.get_event_loop().run_until_complete(self.ws.close())
+            asyncio.get_event_loop().run_until_complete(self.close())
+
+
+class NetworkService:
+    '''
+    Runs a `WSConnection` on an asyncio event loop in its own thread, so connecting, slow
+    servers and bursts of messages never hold up a frame of the (plain, synchronous)
+    `GameLoop`.
+
+    Messages received on `channels` are posted to the pygame event queue as
+    `message_event` events, with `channel` and `msg` attributes (`msg` includes the
+    channel too); `install()` has `GameLoop` hand them to the current scene's
+    `handle_message()`. `status_event` events (with a `connected` attribute) are posted
+    when the connection comes up or drops. `send()` can be called from any thread: it puts
+    the message on a thread-safe queue and wakes the network thread to send it.
+    ```py
+    network = NetworkService('wss://wwiipacifront.trudev.tech/ws/chat/')
+    network.install(gameloop)
+    network.start()
+    network.send('chat', 'nickname', {'nickname': nick})
+    ```
+    '''
+    def __init__(
+        self,
+        uri: str,
+        ssl: Any=True,
+        channels: Iterable[str]=CHANNELS
+    ) -> None:
+        self.uri = uri
+        self.ssl = ssl
+        self.channels = tuple(channels)
+        self.message_event = pygame.event.custom_type()
+        self.status_event = pygame.event.custom_type()
+        self.conn: Optional[WSConnection] = None
+        self._outbox: 'queue.SimpleQueue[Tuple[str, str, dict]]' = queue.SimpleQueue()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        # Set by stop(); exists from start() on, so stopping works even before the loop is up
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def install(self, gameloop: GameLoop) -> None:
+        '''
+        Makes `gameloop` pass this service's messages to its current scene.
+        '''
+        gameloop.message_events.add(self.message_event)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(self._main(self._stopping),), daemon=True
+        )
+        self._thread.name = 'NetworkService'
+        self._thread.start()
+
+    def send(self, channel: str, msg_type: str, data: dict) -> None:
+        '''
+        Queues a message to send. Never blocks; messages queued before the connection is up
+        are sent once it is.
+        '''
+        self._outbox.put((channel, msg_type, data))
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                # The loop has already been closed by stop()
+                pass
+
+    def stop(self, timeout: float=5.0) -> None:
+        '''
+        Closes the connection and waits (up to `timeout` seconds) for the thread to exit.
+        '''
+        if self._thread is None:
+            return
+        self._stopping.set()
+        # If the loop isn't up yet, _main() sees _stopping once it is
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._stop.set)
+            except RuntimeError:
+                pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _post_status(self, connected: bool) -> None:
+        pygame.event.post(pygame.event.Event(self.status_event, connected=connected))
+
+    async def _main(self, stopping: threading.Event) -> None:
+        self.conn = WSConnection(self.uri, self.ssl)
+        self.conn.on_status.append(self._post_status)
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        # Published last: other threads only touch the loop once everything above exists
+        self._loop = asyncio.get_running_loop()
+        # stop() called before the loop was published
+        if stopping.is_set():
+            self._stop.set()
+        # Anything sent before the loop was up is already waiting
+        self._wake.set()
+        tasks = [asyncio.ensure_future(self._receive(channel)) for channel in self.channels]
+        tasks.append(asyncio.ensure_future(self._send_queued()))
+        await self._stop.wait()
+        await self.conn.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop = None
+
+    async def _receive(self, channel: str) -> None:
+        while True:
+            msg = await self.conn.recv(channel)
+            if msg is None:
+                return
+            msg['channel'] = channel
+            # SDL's event queue is thread safe, and posting wakes an idle GameLoop up
+            pygame.event.post(pygame.event.Event(self.message_event, channel=channel, msg=msg))
+
+    async def _send_queued(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while True:
+                try:
+                    item = self._outbox.get_nowait()
+                except queue.Empty:
+                    break
+                await self.conn.send(*item)
+
+
+class AsyncGameLoop(GameLoop):
+    '''
+    A `GameLoop` that runs as a task in an `asyncio` event loop, so websocket I/O and
+    rendering share one thread without blocking each other.
+
+    Frames are paced with `AsyncClock.tick()`, which awaits instead of sleeping, so network
+    tasks run in the gaps between frames. Use `spawn()` to start them and `listen()` to
+    feed a websocket client's messages to the current scene as they arrive.
+    '''
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.clock = AsyncClock()
+        self.tasks: Set[asyncio.Task] = set()
+        self._since_step = 0.0
+
+    def spawn(self, coro: Coroutine) -> asyncio.Task:
+        '''
+        Schedules `coro` to run alongside the frame loop. It is cancelled when the loop exits.
+        '''
+        task = asyncio.get_event_loop().create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def post_message(self, msg: dict) -> None:
+        '''
+        Hands a network message to the current scene right away rather than on the next frame.
+        '''
+        self.current_scene.handle_message(msg)
+        self.idle = False
+
+    async def listen(self, client: WSClientMixin) -> None:
+        '''
+        Receives messages from `client` forever and posts each one to the current scene.
+        '''
+        async for msg in client.messages():
+            self.post_message(msg)
+
+    async def run_async(self) -> None:
+        self.running = True
+        self.start_music()
+        while self.running:
+            t = perf_counter()
+            events = pygame.event.get()
+            # Blocking in pygame.event.wait() would stall the network tasks, so while idle we
+            # keep polling (cheap) but only run a full frame at the idle rate
+            stepping = events or not self.idle or self._since_step >= 1 / max(self.idle_fps, 1)
+            if stepping:
+                # Idle polls since the last frame were counted towards it; commit it now
+                self.stats.end_frame()
+                if self.profiler.active:
+                    self.profiler.frame_done()
+            self.stats.lap('pump', t)
+            if stepping:
+                self.dt = self._since_step
+                self._since_step = 0.0
+                if self.input_hook is not None:
+                    events = self.input_hook.process(self, events)
+                self.step(events)
+            t = perf_counter()
+            self._since_step += await self.clock.tick(self.fps) / 1000
+            self.stats.lap('sleep', t)
+            self.update_caption()
+        self.shutdown()
+        for task in list(self.tasks):
+            task.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
 
+    def run(self) -> None:
+        asyncio.get_event_loop().run_until_complete(self.run_async())
 
 
 class UIElement(pygame.sprite.DirtySprite):
@@ -180,7 +585,7 @@ class Message(UIElement):
 
 class PyGameChatClient(WSClientMixin, UIContainer):
     def __init__(self, uri: str='wss://wwiipacifront.trudev.tech/ws/chat/', ssl: Any=True) -> None:
-        super().__init__(uri=uri, ssl=ssl)
+        super().__init__(uri=uri, ssl=ssl, channel='chat')
         
 
     async def client(self) -> None:
@@ -192,6 +597,6 @@ class PyGameChatClient(WSClientMixin, UIContainer):
             asyncio.get_event_loop().run_forever()
         except KeyboardInterrupt:
             print('Closing Socket...')
-            asyncio.get_event_loop().run_until_complete(self.ws.close())
+            asyncio.get_event_loop().run_until_complete(self.close())
 
 
@@ -0,0 +1,257 @@
+# WWII Pacific Front - particles.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Particle effects (explosions, smoke and splashes) for shots.
+
+Particles aren't sprites: `ParticleSystem` keeps their positions, velocities and ages in
+flat arrays, one entry per particle, and draws all of them with a single `Surface.blits()`
+call. Each effect has a handful of stamps rendered up front (one per fade level), so drawing
+never creates a surface.
+
+NumPy is used to update the arrays in bulk when it's installed; otherwise the same arrays
+are kept with the standard library `array` module and updated in a plain loop. It's only
+imported when the first `ParticleSystem` is made, so scenes without particles never load it.
+'''
+
+from array import array
+from math import cos, pi, sin
+import random
+from typing import Any, Dict, Final, List, NamedTuple, Optional, Tuple
+
+import pygame
+import pygame.draw
+
+from .memory import track
+
+np: Any = None # numpy, once _import_numpy() has found it
+_numpy_checked = False
+
+FADE_LEVELS: Final[int] = 8
+
+
+class Effect(NamedTuple):
+    color: Tuple[int, int, int]
+    radius: int
+    count: int
+    speed: Tuple[float, float] # px/s
+    life: Tuple[float, float] # seconds
+    drag: float # fraction of velocity lost per second
+    gravity: float # px/s², positive is down the screen
+
+
+EFFECTS: Final[Dict[str, Effect]] = {
+    'explosion': Effect((255, 160, 40), 5, 60, (40, 220), (0.3, 0.8), 2.5, 0),
+    'smoke': Effect((90, 90, 90), 7, 25, (10, 50), (0.8, 1.8), 1.0, -25),
+    'splash': Effect((210, 235, 255), 3, 40, (60, 200), (0.4, 0.9), 3.0, 0),
+}
+
+_FIELDS: Final[Tuple[str, ...]] = ('x', 'y', 'vx', 'vy', 'age', 'life', 'drag', 'gravity')
+
+
+def _import_numpy() -> None:
+    global np, _numpy_checked
+    if _numpy_checked:
+        return
+    _numpy_checked = True
+    try:
+        import numpy
+    except ImportError:
+        return
+    np = numpy
+
+
+class ParticleSystem:
+    '''
+    Holds up to `capacity` particles. Live particles are kept packed at the front of the
+    arrays; particles emitted while full are dropped, so nothing is ever reallocated.
+
+    Positions are in board coordinates; `draw()` takes the board's offset on screen.
+    '''
+    def __init__(
+        self,
+        capacity: int=4096,
+        effects: Optional[Dict[str, Effect]]=None,
+        seed: Optional[int]=None
+    ) -> None:
+        self.capacity = capacity
+        self.effects = dict(EFFECTS if effects is None else effects)
+        self.count = 0
+        self.kinds = list(self.effects)
+        _import_numpy()
+        if np is not None:
+            for field in _FIELDS:
+                setattr(self, field, np.zeros(capacity, dtype=np.float32))
+            self.kind = np.zeros(capacity, dtype=np.int16)
+        else:
+            for field in _FIELDS:
+                setattr(self, field, array('f', bytes(4 * capacity)))
+            self.kind = array('h', bytes(2 * capacity))
+        self.seed(seed)
+        # stamps[kind * FADE_LEVELS + level]
+        self.stamps: List[pygame.Surface] = []
+        for effect in self.effects.values():
+            self.stamps.extend(self._render_stamps(effect))
+        self.half_sizes = [s.get_width() // 2 for s in self.stamps]
+        self.bounds: Optional[pygame.Rect] = None
+
+    def seed(self, seed: Optional[int]) -> None:
+        '''
+        Restarts the random numbers particles are emitted with from `seed` (None: unseeded).
+        '''
+        self._rng = np.random.default_rng(seed) if np is not None else random.Random(seed)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _render_stamps(self, effect: Effect) -> List[pygame.Surface]:
+        stamps = []
+        for level in range(FADE_LEVELS):
+            fade = 1 - level / FADE_LEVELS
+            radius = max(1, round(effect.radius * (0.5 + fade / 2)))
+            stamp = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(stamp, (*effect.color, round(255 * fade)), (radius, radius), radius)
+            if pygame.display.get_surface() is not None:
+                stamp = stamp.convert_alpha()
+            stamps.append(track(stamp, self))
+        return stamps
+
+    def emit(self, name: str, pos: Tuple[float, float], scale: float=1.0) -> int:
+        '''
+        Spawns effect `name` at `pos`, with `scale` times its usual particle count.
+        Returns how many particles were actually spawned.
+        '''
+        effect = self.effects[name]
+        start = self.count
+        n = min(round(effect.count * scale), self.capacity - start)
+        if n <= 0:
+            return 0
+        end = start + n
+        kind = self.kinds.index(name)
+        if np is not None:
+            rng = self._rng
+            angle = rng.uniform(0, 2 * pi, n)
+            speed = rng.uniform(*effect.speed, n)
+            self.x[start:end] = pos[0]
+            self.y[start:end] = pos[1]
+            self.vx[start:end] = np.cos(angle) * speed
+            self.vy[start:end] = np.sin(angle) * speed
+            self.life[start:end] = rng.uniform(*effect.life, n)
+            self.age[start:end] = 0
+            self.drag[start:end] = effect.drag
+            self.gravity[start:end] = effect.gravity
+            self.kind[start:end] = kind
+        else:
+            uniform = self._rng.uniform
+            for i in range(start, end):
+                angle = uniform(0, 2 * pi)
+                speed = uniform(*effect.speed)
+                self.x[i] = pos[0]
+                self.y[i] = pos[1]
+                self.vx[i] = cos(angle) * speed
+                self.vy[i] = sin(angle) * speed
+                self.life[i] = uniform(*effect.life)
+                self.age[i] = 0
+                self.drag[i] = effect.drag
+                self.gravity[i] = effect.gravity
+                self.kind[i] = kind
+        self.count = end
+        return n
+
+    def update(self, dt: float) -> None:
+        '''
+        Advances every particle by `dt` seconds and drops the ones that have expired.
+        '''
+        if not self.count:
+            return
+        if np is not None:
+            self._update_numpy(dt)
+        else:
+            self._update_array(dt)
+
+    def _update_numpy(self, dt: float) -> None:
+        n = self.count
+        x, y, vx, vy = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n]
+        x += vx * dt
+        y += vy * dt
+        damp = np.maximum(1 - self.drag[:n] * dt, 0)
+        vx *= damp
+        vy *= damp
+        vy += self.gravity[:n] * dt
+        self.age[:n] += dt
+        alive = self.age[:n] < self.life[:n]
+        live = int(np.count_nonzero(alive))
+        if live != n:
+            for field in (*_FIELDS, 'kind'):
+                arr = getattr(self, field)
+                arr[:live] = arr[:n][alive]
+            self.count = live
+
+    def _update_array(self, dt: float) -> None:
+        x, y, vx, vy = self.x, self.y, self.vx, self.vy
+        age, life, drag, gravity, kind = self.age, self.life, self.drag, self.gravity, self.kind
+        live = 0
+        for i in range(self.count):
+            a = age[i] + dt
+            if a >= life[i]:
+                continue
+            damp = max(1 - drag[i] * dt, 0)
+            x[live] = x[i] + vx[i] * dt
+            y[live] = y[i] + vy[i] * dt
+            vx[live] = vx[i] * damp
+            vy[live] = vy[i] * damp + gravity[i] * dt
+            age[live] = a
+            life[live] = life[i]
+            drag[live] = drag[i]
+            gravity[live] = gravity[i]
+            kind[live] = kind[i]
+            live += 1
+        self.count = live
+
+    def _stamp_indices(self) -> List[int]:
+        n = self.count
+        if np is not None:
+            level = (self.age[:n] / self.life[:n] * FADE_LEVELS).astype(np.int16)
+            return (self.kind[:n] * FADE_LEVELS + np.minimum(level, FADE_LEVELS - 1)).tolist()
+        age, life, kind = self.age, self.life, self.kind
+        return [
+            kind[i] * FADE_LEVELS + min(int(age[i] / life[i] * FADE_LEVELS), FADE_LEVELS - 1)
+            for i in range(n)
+        ]
+
+    def draw(
+        self,
+        screen: pygame.Surface,
+        offset: Tuple[int, int]=(0, 0),
+        scale: float=1.0
+    ) -> List[pygame.Rect]:
+        '''
+        Blits every live particle in one call, with positions multiplied by `scale` (the
+        board's zoom). Returns the area drawn this frame and the area drawn last frame, which
+        also needs updating on screen.
+        '''
+        prev = self.bounds
+        self.bounds = None
+        n = self.count
+        if n:
+            ox, oy = offset
+            stamps = self._stamp_indices()
+            half = self.half_sizes
+            if np is not None:
+                xs = (self.x[:n] * scale + ox).astype(np.int32).tolist()
+                ys = (self.y[:n] * scale + oy).astype(np.int32).tolist()
+            else:
+                xs = [int(v * scale + ox) for v in self.x[:n]]
+                ys = [int(v * scale + oy) for v in self.y[:n]]
+            blit_seq = [
+                (self.stamps[s], (px - half[s], py - half[s])) for s, px, py in zip(stamps, xs, ys)
+            ]
+            screen.blits(blit_seq, doreturn=False)
+            pad = max(half)
+            left, top = min(xs) - pad, min(ys) - pad
+            self.bounds = pygame.Rect(
+                left, top, max(xs) + pad - left, max(ys) + pad - top
+            ).clip(screen.get_rect())
+        return [r for r in (self.bounds, prev) if r is not None]
+
+    def clear(self) -> None:
+        self.count = 0
@@ -0,0 +1,181 @@
+# WWII Pacific Front - perf.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Frame-time instrumentation for `GameLoop`.
+
+`FrameStats` keeps the time spent in each phase of the last few hundred frames in
+`RingBuffer`s, along with how many rects and pixels were sent to the display.
+`PerfOverlay` shows their percentiles on screen.
+'''
+
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING, Dict, Final, List, Optional, Sequence, Tuple, Union
+
+import pygame
+import pygame.freetype
+
+from .misc_utils import RingBuffer
+
+if TYPE_CHECKING:
+    from .latency import LatencyTracker
+    from .memory import SurfaceTracker
+
+PHASES: Final[Tuple[str, ...]] = (
+    'pump', 'handle_event', 'fixed_update', 'update', 'render', 'display', 'sleep'
+)
+
+class FrameStats:
+    '''
+    Collects per-phase timings for each frame. Times are in seconds.
+
+    Phases are timed with `lap()` while a frame runs, and the whole frame is committed to
+    the ring buffers with `end_frame()`, so every buffer always describes the same frames.
+    '''
+    def __init__(self, history: int=600) -> None:
+        self.phases: Dict[str, RingBuffer] = {p: RingBuffer(history) for p in PHASES}
+        self.rect_counts = RingBuffer(history)
+        self.pixel_counts = RingBuffer(history)
+        self.frames = 0
+        self._current: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self._rects = 0
+        self._pixels = 0
+
+    def lap(self, phase: str, start: float) -> float:
+        '''
+        Adds the time since `start` to `phase` and returns the current time,
+        so laps can be chained.
+        '''
+        now = perf_counter()
+        self._current[phase] += now - start
+        return now
+
+    def add(self, phase: str, seconds: float) -> None:
+        self._current[phase] += seconds
+
+    def count_rects(self, rects: Sequence[pygame.Rect]) -> None:
+        '''
+        Records the rects passed to `pygame.display.update()` this frame.
+        '''
+        self._rects += len(rects)
+        self._pixels += sum(r.w * r.h for r in rects)
+
+    def end_frame(self) -> None:
+        for phase, seconds in self._current.items():
+            self.phases[phase].append(seconds)
+            self._current[phase] = 0.0
+        self.rect_counts.append(self._rects)
+        self.pixel_counts.append(self._pixels)
+        self._rects = 0
+        self._pixels = 0
+        self.frames += 1
+
+    def percentiles(
+        self,
+        phase: str,
+        pcts: Sequence[float]=(50, 95, 99)
+    ) -> List[float]:
+        '''
+        Returns the given percentiles of a phase, in milliseconds.
+        '''
+        buf = self.phases[phase]
+        return [buf.percentile(p) * 1000 for p in pcts]
+
+    def dump_csv(self, path: Union[str, Path]) -> Path:
+        '''
+        Writes the buffered samples to a CSV file, one row per frame (oldest first),
+        with phase times in milliseconds.
+        '''
+        import csv
+
+        path = Path(path)
+        first_frame = self.frames - len(self.rect_counts)
+        columns = [iter(self.phases[p]) for p in PHASES]
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', *(f'{p}_ms' for p in PHASES), 'rects', 'pixels'])
+            for i, (rects, pixels) in enumerate(zip(self.rect_counts, self.pixel_counts)):
+                writer.writerow([
+                    first_frame + i,
+                    *(f'{next(c) * 1000:.3f}' for c in columns),
+                    int(rects),
+                    int(pixels),
+                ])
+        return path
+
+
+class PerfOverlay:
+    '''
+    Draws p50/p95/p99 for each phase of `FrameStats` in the corner of the screen, and for
+    input latency and surface memory if given a `LatencyTracker` and `SurfaceTracker`.
+
+    The text is only re-rendered `refresh_hz` times a second; in between, the cached
+    surface is blitted as-is.
+    '''
+    def __init__(
+        self,
+        stats: FrameStats,
+        font: Optional[pygame.freetype.Font]=None,
+        text_size: int=14,
+        refresh_hz: float=4,
+        pos: Tuple[int, int]=(4, 4),
+        latency: Optional['LatencyTracker']=None,
+        surfaces: Optional['SurfaceTracker']=None
+    ) -> None:
+        self.stats = stats
+        self.latency = latency
+        self.surfaces = surfaces
+        self.font = font if font is not None else pygame.freetype.Font(
+            Path(__file__).parent.parent / 'assets' / 'font' / 'CutiveMono-Regular.ttf', text_size
+        )
+        self.text_size = text_size
+        self.refresh_interval = 1 / refresh_hz
+        self.visible = False
+        self.rect = pygame.Rect(pos, (0, 0))
+        self.image: Optional[pygame.Surface] = None
+        self._last_refresh = 0.0
+
+    def toggle(self) -> Optional[pygame.Rect]:
+        '''
+        Shows or hides the overlay. When hiding, returns the area that needs repainting.
+        '''
+        self.visible = not self.visible
+        if self.visible:
+            self._last_refresh = 0.0
+            return None
+        return pygame.Rect(self.rect)
+
+    def refresh(self) -> None:
+        lines = ['phase         p50    p95    p99 (ms)']
+        for phase in PHASES:
+            p50, p95, p99 = self.stats.percentiles(phase)
+            lines.append(f'{phase:<12}{p50:>6.2f} {p95:>6.2f} {p99:>6.2f}')
+        lines.append(
+            f'rects {self.stats.rect_counts.mean():.1f}  '
+            f'px {self.stats.pixel_counts.mean() / 1000:.1f}k'
+        )
+        if self.latency is not None:
+            for kind, samples in self.latency.samples.items():
+                if len(samples):
+                    p50, p95, p99 = self.latency.percentiles(kind)
+                    lines.append(f'in:{kind:<9}{p50:>6.2f} {p95:>6.2f} {p99:>6.2f}')
+        if self.surfaces is not None:
+            lines.append(f'surfaces {self.surfaces.total / 2**20:.1f} MiB')
+        line_h = self.font.get_sized_height(self.text_size)
+        width = max(self.font.get_rect(line, size=self.text_size).w for line in lines) + 8
+        self.image = pygame.Surface((width, line_h * len(lines) + 8))
+        self.image.fill(pygame.Color('Black'))
+        for i, line in enumerate(lines):
+            self.font.render_to(
+                self.image, (4, 4 + i * line_h), line, pygame.Color('White'), size=self.text_size
+            )
+        self.rect.size = self.image.get_size()
+
+    def draw(self, screen: pygame.Surface) -> List[pygame.Rect]:
+        if not self.visible:
+            return []
+        now = perf_counter()
+        if self.image is None or now - self._last_refresh >= self.refresh_interval:
+            self._last_refresh = now
+            self.refresh()
+        return [screen.blit(self.image, self.rect)]
@@ -0,0 +1,107 @@
+# WWII Pacific Front - placement.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Where ships can legally go on a board.
+
+`PlacementMask` keeps, for every tile, how many free tiles there are from it to the right
+and from it downwards. A ship `length` tiles long fits with its first tile at (x, y) exactly
+when that run is at least `length`, so checking a position is one lookup. Occupying or
+freeing a tile only changes the runs of the free tiles before it in its row and column.
+
+`anchors()` turns the runs into a mask of every legal position (one byte per tile, 1 where
+the ship fits) with a single `bytes.translate()`. Masks are cached until a tile changes.
+'''
+
+from typing import Dict, Final, Tuple
+
+import pygame
+
+MAX_RUN: Final[int] = 255 # runs are stored in bytes; longer runs are capped (no ship is that long)
+
+
+class PlacementMask:
+    '''
+    Free/occupied tiles of a `size` board, for ships one tile wide.
+    '''
+    def __init__(self, size: Tuple[int, int]) -> None:
+        w, h = size
+        self.size = size
+        self.occupied = bytearray(w * h)
+        self.run_right = bytearray(min(w - x, MAX_RUN) for _ in range(h) for x in range(w))
+        self.run_down = bytearray(min(h - y, MAX_RUN) for y in range(h) for _ in range(w))
+        self._anchors: Dict[Tuple[int, bool], bytes] = {}
+
+    def fits(self, pos: Tuple[int, int], length: int, vertical: bool=False) -> bool:
+        '''
+        Whether a ship `length` tiles long can have its first tile at `pos`.
+        '''
+        x, y = pos
+        w, h = self.size
+        if not (0 <= x < w and 0 <= y < h):
+            return False
+        runs = self.run_down if vertical else self.run_right
+        return runs[y * w + x] >= length
+
+    def anchors(self, length: int, vertical: bool=False) -> bytes:
+        '''
+        One byte per tile, row by row: 1 where a ship `length` tiles long fits with its
+        first tile there, 0 elsewhere.
+        '''
+        key = (length, vertical)
+        mask = self._anchors.get(key)
+        if mask is None:
+            table = bytes(run >= length for run in range(256))
+            runs = self.run_down if vertical else self.run_right
+            mask = self._anchors[key] = bytes(runs.translate(table))
+        return mask
+
+    def occupy(self, rect: pygame.Rect) -> None:
+        '''
+        Marks the tiles in `rect` as taken.
+        '''
+        self._set(rect, 1)
+
+    def release(self, rect: pygame.Rect) -> None:
+        '''
+        Marks the tiles in `rect` as free again.
+        '''
+        self._set(rect, 0)
+
+    def _set(self, rect: pygame.Rect, value: int) -> None:
+        rect = rect.clip((0, 0) + self.size)
+        if not rect.w or not rect.h:
+            return
+        w, h = self.size
+        occupied = self.occupied
+        for y in range(rect.top, rect.bottom):
+            for x in range(rect.left, rect.right):
+                occupied[y * w + x] = value
+        # Going from the last tile back, each tile's run only depends on the one after it
+        for y in range(rect.top, rect.bottom):
+            self._fix_runs(self.run_right, y * w + rect.right - 1, 1, rect.left, rect.right, w)
+        for x in range(rect.left, rect.right):
+            self._fix_runs(self.run_down, (rect.bottom - 1) * w + x, w, rect.top, rect.bottom, h)
+        self._anchors.clear()
+
+    def _fix_runs(
+        self, runs: bytearray, i: int, stride: int, start: int, end: int, limit: int
+    ) -> None:
+        # Recomputes the runs of the tiles from `start` to `end` (exclusive) along a row or
+        # column `limit` tiles long, where `i` is the index of the last one, then the runs of
+        # the tiles before them until an occupied tile, which is 0 whatever comes after it
+        occupied = self.occupied
+        pos = end - 1
+        run = 0
+        if not occupied[i]:
+            run = 1 + (runs[i + stride] if end < limit else 0)
+        runs[i] = min(run, MAX_RUN)
+        while pos > 0:
+            i -= stride
+            pos -= 1
+            if occupied[i]:
+                if runs[i] == 0 and pos < start:
+                    break
+                run = 0
+            else:
+                run += 1
+            runs[i] = min(run, MAX_RUN)
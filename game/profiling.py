@@ -0,0 +1,116 @@
+# WWII Pacific Front - profiling.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+On-demand `cProfile` capture for `GameLoop`.
+
+A capture runs for a set number of frames (or seconds), then writes a `.pstats` file and a
+plain text summary of the top functions. Start one with the F9 debug key, or at startup by
+setting one of these environment variables:
+
+- `WWII_PROFILE_FRAMES`: number of frames to capture
+- `WWII_PROFILE_SECONDS`: capture for this many seconds instead
+- `WWII_PROFILE_DIR`: where to write the output (default: `profiles`)
+- `WWII_PROFILE_TOP`: how many functions the text summary lists (default: 40)
+
+While no capture is running, the only cost is `GameLoop` checking `FrameProfiler.active`
+once per frame; `cProfile` and `pstats` aren't even imported until a capture starts.
+'''
+
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Union
+
+if TYPE_CHECKING:
+    import cProfile
+
+
+class FrameProfiler:
+    def __init__(
+        self,
+        frames: int=300,
+        seconds: Optional[float]=None,
+        out_dir: Union[str, Path]='profiles',
+        top: int=40
+    ) -> None:
+        self.frames = frames
+        self.seconds = seconds
+        self.out_dir = Path(out_dir)
+        self.top = top
+        self.active = False
+        self._profile: Optional['cProfile.Profile'] = None
+        self._frames_left = 0
+        self._end_time = 0.0
+
+    @classmethod
+    def from_env(cls) -> 'FrameProfiler':
+        '''
+        Builds a `FrameProfiler` from the `WWII_PROFILE_*` environment variables, and starts
+        it right away if a frame count or duration was given.
+        '''
+        frames = os.environ.get('WWII_PROFILE_FRAMES')
+        seconds = os.environ.get('WWII_PROFILE_SECONDS')
+        profiler = cls(
+            frames=int(frames) if frames else 300,
+            seconds=float(seconds) if seconds else None,
+            out_dir=os.environ.get('WWII_PROFILE_DIR', 'profiles'),
+            top=int(os.environ.get('WWII_PROFILE_TOP', 40)),
+        )
+        if frames or seconds:
+            profiler.start()
+        return profiler
+
+    def start(self) -> None:
+        if self.active:
+            return
+        import cProfile
+        self._frames_left = self.frames
+        self._end_time = time.perf_counter() + self.seconds if self.seconds else 0.0
+        self._profile = cProfile.Profile()
+        self.active = True
+        self._profile.enable()
+
+    def toggle(self) -> None:
+        '''
+        Starts a capture, or cuts the running one short and writes it out.
+        '''
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def frame_done(self) -> None:
+        '''
+        Called by `GameLoop` after every frame while `active`.
+        '''
+        self._frames_left -= 1
+        if self.seconds:
+            if time.perf_counter() >= self._end_time:
+                self.stop()
+        elif self._frames_left <= 0:
+            self.stop()
+
+    def stop(self) -> Optional[Path]:
+        '''
+        Ends the capture and writes `<name>.pstats` and `<name>.txt`. Returns the
+        `.pstats` path.
+        '''
+        if not self.active:
+            return None
+        self._profile.disable()
+        self.active = False
+        import pstats
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        base = self.out_dir / time.strftime('profile_%Y%m%d_%H%M%S')
+        stats_path = base.with_suffix('.pstats')
+        self._profile.dump_stats(stats_path)
+        with open(base.with_suffix('.txt'), 'w') as f:
+            frames = self.frames - self._frames_left
+            f.write(f'{frames} frames profiled\n\n')
+            stats = pstats.Stats(self._profile, stream=f)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        self._profile = None
+        print('Profile written to', stats_path)
+        return stats_path
@@ -1,41 +1,102 @@
-import asyncio
-
 import pygame
 
+from .misc_utils import RingBuffer
+
 
 class AsyncClock:
-    def __init__(self, time_func=pygame.time.get_ticks):
+    '''
+    An `asyncio` counterpart to `pygame.time.Clock`.
+
+    `tick()` sleeps until a deadline that advances by exactly one frame each call, instead of
+    sleeping "one frame minus however long this frame took". Rounding errors and coarse
+    `asyncio.sleep()` wakeups don't accumulate, so the average frame rate stays on target.
+    '''
+    def __init__(self, time_func=pygame.time.get_ticks, history: int=60):
         self.time_func = time_func
         self.last_tick = time_func() or 0
-        self.last_10_diffs = []
- 
-    async def tick(self, fps=0):
-        current = self.time_func()
-        time_diff = current - self.last_tick
-        self.last_10_diffs.append(time_diff)
-        if len(self.last_10_diffs) >= 10:
-            del self.last_10_diffs[0]
+        self.deadline = None
+        self.frame_times = RingBuffer(history)
 
-        if fps <= 0:
-            return time_diff
+    async def tick(self, fps=0):
+        # Imported here so importing FixedTimestep doesn't pull in asyncio
+        import asyncio
 
-        end_time = (1.0 / fps) * 1000
-        delay = (end_time - time_diff) / 1000
+        if fps > 0:
+            frame_ms = 1000.0 / fps
+            if self.deadline is None:
+                self.deadline = self.last_tick
+            self.deadline += frame_ms
+            delay = self.deadline - self.time_func()
+            if delay < -frame_ms:
+                # More than a frame behind: resync instead of rushing out a burst of frames
+                self.deadline = self.time_func()
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            else:
+                # Over budget, but other tasks (the network) still get their turn
+                await asyncio.sleep(0)
+        else:
+            self.deadline = None
+            # Still yield, so other tasks get to run between frames
+            await asyncio.sleep(0)
 
+        current = self.time_func()
+        time_diff = current - self.last_tick
         self.last_tick = current
-
-        if delay < 0:
-            delay = 0
- 
-        await asyncio.sleep(delay)
-
+        self.frame_times.append(time_diff)
         return time_diff
 
+    def get_time(self):
+        '''
+        Milliseconds between the last two ticks.
+        '''
+        return self.frame_times.last()
+
     def get_fps(self):
-        if len(self.last_10_diffs) >= 5:
-            return (len(self.last_10_diffs) / sum(self.last_10_diffs)) * 1000
+        if len(self.frame_times) >= 5 and self.frame_times.total() > 0:
+            return 1000 / self.frame_times.mean()
         else:
             return 0
 
 
+class FixedTimestep:
+    '''
+    Accumulates real frame time and hands it out in fixed-size simulation steps, so
+    game logic runs the same at 30, 60 or 144 FPS.
+
+    `GameLoop` uses it like:
+    ```py
+    for _ in range(timestep.advance(dt)):
+        scene.fixed_update(timestep.step)
+    scene.update()
+    ```
+    `alpha` is how far we are between the last simulated state and the next one, for
+    interpolating what gets drawn; scenes read it as `gameloop.timestep.alpha` in `update()`.
+
+    `max_steps` caps the catch-up after a long stall, so one slow frame can't snowball
+    into a "spiral of death". Time past the cap is dropped.
+    '''
+    def __init__(self, step: float=1 / 120, max_steps: int=8) -> None:
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    def advance(self, dt: float) -> int:
+        '''
+        Adds `dt` seconds of real time and returns how many fixed steps to simulate.
+        '''
+        self.accumulator += dt
+        steps = int(self.accumulator // self.step)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator %= self.step
+        else:
+            self.accumulator -= steps * self.step
+        return steps
 
+    @property
+    def alpha(self) -> float:
+        '''
+        The interpolation factor (0 to 1) between the previous and current simulation state.
+        '''
+        return self.accumulator / self.step
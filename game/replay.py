@@ -0,0 +1,285 @@
+# WWII Pacific Front - replay.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Deterministic input recording and replay for `GameLoop`, so performance runs can be
+compared session to session.
+
+`InputRecorder` writes one line per frame with the frame's events, the mouse state (only
+when it changed), `pygame.time.get_ticks()` and the frame's `dt`, after a header with the
+seed the scenes' random effects (particles) were given. `InputReplayer` feeds
+those back: it replaces the live event stream and patches the polling functions the sprites
+use (`pygame.mouse.get_pos()`, `pygame.mouse.get_pressed()`, `pygame.key.get_pressed()` and
+`pygame.time.get_ticks()`) so every frame sees exactly what it saw when recorded.
+
+Recordings are gzipped JSON lines. From the command line:
+```sh
+python -m game.replay record session.wwrec --scene demo_board
+python -m game.replay play session.wwrec            # headless, as fast as possible
+python -m game.replay play session.wwrec --realtime # at the recorded frame rate
+```
+'''
+
+import argparse
+import gzip
+import json
+import os
+import random
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple, Union
+
+import pygame
+import pygame.event
+import pygame.key
+import pygame.mouse
+import pygame.time
+
+if TYPE_CHECKING:
+    from .gamemodels import GameLoop
+
+FORMAT_VERSION = 1
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (tuple, list)):
+        return [_encode_value(v) for v in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError
+
+
+def _encode_event(event: pygame.event.Event) -> List[Any]:
+    attrs = {}
+    for k, v in event.dict.items():
+        try:
+            attrs[k] = _encode_value(v)
+        except TypeError:
+            pass # e.g. window handles; nothing in the game reads those
+    return [event.type, attrs]
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(_decode_value(v) for v in value)
+    return value
+
+
+def _decode_event(data: List[Any]) -> pygame.event.Event:
+    ev_type, attrs = data
+    return pygame.event.Event(ev_type, {k: _decode_value(v) for k, v in attrs.items()})
+
+
+class InputRecorder:
+    '''
+    Records the input `GameLoop` sees, frame by frame. Attach it before running the loop:
+    ```py
+    InputRecorder('session.wwrec').attach(gameloop)
+    gameloop.run()
+    ```
+    '''
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._file = None
+        self.frame = 0
+        self._mouse_pos: Optional[Tuple[int, int]] = None
+        self._mouse_buttons: Optional[Tuple[bool, ...]] = None
+
+    def attach(self, gameloop: 'GameLoop') -> None:
+        self._file = gzip.open(self.path, 'wt')
+        seed = random.getrandbits(32)
+        gameloop.set_seed(seed)
+        header = {
+            'version': FORMAT_VERSION,
+            'scene': gameloop.scene_name,
+            'size': list(gameloop.screen.get_size()),
+            'fps': gameloop.fps,
+            'seed': seed,
+            'ticks': gameloop.timeline.now,
+        }
+        self._file.write(json.dumps(header) + '\n')
+        gameloop.input_hook = self
+
+    def process(
+        self,
+        gameloop: 'GameLoop',
+        events: List[pygame.event.Event]
+    ) -> List[pygame.event.Event]:
+        '''
+        Called by `GameLoop` with each frame's events before they are dispatched.
+        '''
+        mouse_pos = pygame.mouse.get_pos()
+        mouse_buttons = pygame.mouse.get_pressed()
+        record = [
+            self.frame,
+            pygame.time.get_ticks(),
+            round(gameloop.dt * 1000),
+            list(mouse_pos) if mouse_pos != self._mouse_pos else None,
+            list(mouse_buttons) if mouse_buttons != self._mouse_buttons else None,
+            [_encode_event(e) for e in events],
+        ]
+        self._mouse_pos = mouse_pos
+        self._mouse_buttons = mouse_buttons
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.frame += 1
+        return events
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _HeldKeys:
+    '''
+    Stands in for the `ScancodeWrapper` returned by `pygame.key.get_pressed()`.
+    '''
+    def __init__(self) -> None:
+        self.keys: Set[int] = set()
+
+    def __getitem__(self, key: int) -> bool:
+        return key in self.keys
+
+
+class InputReplayer:
+    '''
+    Plays a recording back into a `GameLoop`. Live input is ignored (except closing the
+    window), and the loop stops when the recording ends. Call `close()` once it has.
+
+    With `realtime=False`, frames aren't throttled at all, which makes the wall time of a
+    replay a benchmark of the frames themselves.
+    '''
+    def __init__(self, path: Union[str, Path], realtime: bool=False) -> None:
+        self.path = Path(path)
+        self.realtime = realtime
+        self._file = gzip.open(self.path, 'rt')
+        self.header: Dict[str, Any] = json.loads(self._file.readline())
+        if self.header.get('version') != FORMAT_VERSION:
+            raise ValueError(f'Unsupported recording version: {self.header.get("version")}')
+        self.frame = 0
+        self.finished = False
+        self._ticks = 0
+        self._mouse_pos: Tuple[int, int] = (0, 0)
+        self._mouse_buttons: Tuple[bool, ...] = (False, False, False)
+        self._held = _HeldKeys()
+        self._originals: Dict[Tuple[Any, str], Any] = {}
+
+    def _patch(self, module: Any, name: str, func: Any) -> None:
+        self._originals[(module, name)] = getattr(module, name)
+        setattr(module, name, func)
+
+    def attach(self, gameloop: 'GameLoop') -> None:
+        gameloop.input_hook = self
+        # Idle waiting would block on live input that is about to be thrown away
+        gameloop.adaptive = False
+        # No music, and no option edits from outside changing the run
+        gameloop.live = False
+        # Recordings from before seeds were recorded replay with a fixed one
+        gameloop.set_seed(self.header.get('seed', 0))
+        # Animations scheduled so far are due relative to when the loop was made, so they
+        # move to the recording's clock along with get_ticks()
+        self._ticks = self.header.get('ticks', 0)
+        gameloop.timeline.rebase(self._ticks)
+        gameloop.fps = self.header['fps'] if self.realtime else 0
+        self._patch(pygame.mouse, 'get_pos', lambda: self._mouse_pos)
+        self._patch(
+            pygame.mouse, 'get_pressed', lambda num_buttons=3: self._mouse_buttons[:num_buttons]
+        )
+        self._patch(pygame.key, 'get_pressed', lambda: self._held)
+        self._patch(pygame.time, 'get_ticks', lambda: self._ticks)
+
+    def process(
+        self,
+        gameloop: 'GameLoop',
+        events: List[pygame.event.Event]
+    ) -> List[pygame.event.Event]:
+        '''
+        Called by `GameLoop` each frame. Swaps the live events for the recorded ones.
+        '''
+        live_quit = [e for e in events if e.type == pygame.QUIT]
+        line = self._file.readline()
+        if not line:
+            # Still patched for this last frame, so it runs on the recording's clock too
+            self.finished = True
+            gameloop.running = False
+            # This last frame wasn't recorded; it mustn't move anything by the real clock
+            gameloop.dt = 0.0
+            return live_quit
+
+        _frame, self._ticks, dt_ms, mouse_pos, mouse_buttons, raw_events = json.loads(line)
+        gameloop.dt = dt_ms / 1000
+        if mouse_pos is not None:
+            self._mouse_pos = tuple(mouse_pos)
+        if mouse_buttons is not None:
+            self._mouse_buttons = tuple(mouse_buttons)
+        replayed = [_decode_event(e) for e in raw_events]
+        for e in replayed:
+            if e.type == pygame.KEYDOWN:
+                self._held.keys.add(e.key)
+            elif e.type == pygame.KEYUP:
+                self._held.keys.discard(e.key)
+        self.frame += 1
+        return replayed + live_quit
+
+    def close(self) -> None:
+        '''
+        Stops the replay and puts the real pygame polling functions back.
+        '''
+        for (module, name), func in self._originals.items():
+            setattr(module, name, func)
+        self._originals.clear()
+        self._file.close()
+
+
+def main(argv: Optional[List[str]]=None) -> None:
+    from .gamemodels import GameLoop
+    from .perf import PHASES, FrameStats
+
+    parser = argparse.ArgumentParser(prog='python -m game.replay')
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record', help='play normally while recording input')
+    rec.add_argument('file')
+    rec.add_argument('--scene', default='menu_main')
+    rec.add_argument('--size', type=int, nargs=2, default=(800, 600))
+    play = sub.add_parser('play', help='replay a recording and report frame times')
+    play.add_argument('file')
+    play.add_argument('--realtime', action='store_true', help='keep the recorded frame rate')
+    play.add_argument('--window', action='store_true', help="don't force the dummy video driver")
+    play.add_argument('--csv', help='also dump per-frame stats to this file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        pygame.init()
+        gameloop = GameLoop(args.scene, tuple(args.size))
+        recorder = InputRecorder(args.file)
+        recorder.attach(gameloop)
+        try:
+            gameloop.run()
+        finally:
+            recorder.close()
+        print(f'Recorded {recorder.frame} frames to {args.file}')
+        return
+
+    if not args.window:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    replayer = InputReplayer(args.file, realtime=args.realtime)
+    gameloop = GameLoop(replayer.header['scene'], tuple(replayer.header['size']))
+    gameloop.stats = FrameStats(history=1 << 16)
+    gameloop.overlay.stats = gameloop.stats
+    replayer.attach(gameloop)
+    start = time.perf_counter()
+    gameloop.run()
+    wall = time.perf_counter() - start
+    replayer.close()
+
+    print(f'{replayer.frame} frames in {wall:.3f}s ({replayer.frame / wall:.1f} FPS)')
+    print(f'{"phase":<14}{"p50":>8}{"p95":>8}{"p99":>8}  (ms)')
+    for phase in PHASES:
+        p50, p95, p99 = gameloop.stats.percentiles(phase)
+        print(f'{phase:<14}{p50:>8.3f}{p95:>8.3f}{p99:>8.3f}')
+    print(gameloop.latency.report())
+    if args.csv:
+        gameloop.stats.dump_csv(args.csv)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# WWII Pacific Front - surface_utils.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+Helpers for building large surfaces out of small ones.
+
+`tile_surface()` fills an area with copies of a tile without a Python call per tile: it
+blits the tile once, then repeatedly copies everything filled so far next to itself, so a
+row of n tiles takes about log2(n) blits, and so do the rows.
+'''
+
+from typing import Optional, Tuple, Union
+
+import pygame
+
+RectLike = Union[pygame.Rect, Tuple[int, int, int, int]]
+
+
+def tile_surface(
+    dest: pygame.Surface,
+    tile: pygame.Surface,
+    area: Optional[RectLike]=None
+) -> pygame.Rect:
+    '''
+    Fills `area` of `dest` (all of it by default) with copies of `tile`, starting from the
+    area's top left corner. Returns the area filled.
+
+    Surfaces with per-pixel alpha can't copy onto themselves without blending, so for those
+    the tiles are drawn with one `Surface.blits()` call instead.
+    '''
+    area = pygame.Rect(area if area is not None else dest.get_rect()).clip(dest.get_rect())
+    tw, th = tile.get_size()
+    if not area.w or not area.h or not tw or not th:
+        return area
+    if dest.get_flags() & pygame.SRCALPHA:
+        dest.blits([
+            (tile, (x, y))
+            for y in range(area.top, area.bottom, th)
+            for x in range(area.left, area.right, tw)
+        ], doreturn=False)
+        return area
+
+    dest.blit(tile, area.topleft, (0, 0, min(tw, area.w), min(th, area.h)))
+    # The copies have to be exact, so colorkey and alpha are off while copying
+    colorkey = dest.get_colorkey()
+    alpha = dest.get_alpha()
+    dest.set_colorkey(None)
+    dest.set_alpha(None)
+    try:
+        filled_w = min(tw, area.w)
+        row_h = min(th, area.h)
+        while filled_w < area.w:
+            n = min(filled_w, area.w - filled_w)
+            dest.blit(dest, (area.x + filled_w, area.y), (area.x, area.y, n, row_h))
+            filled_w += n
+        filled_h = row_h
+        while filled_h < area.h:
+            n = min(filled_h, area.h - filled_h)
+            dest.blit(dest, (area.x, area.y + filled_h), (area.x, area.y, area.w, n))
+            filled_h += n
+    finally:
+        dest.set_colorkey(colorkey)
+        dest.set_alpha(alpha)
+    return area
@@ -0,0 +1,124 @@
+# WWII Pacific Front - timeline.py
+# (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
+'''
+A shared time base for animations.
+
+Instead of every animated sprite reading the clock each frame to check whether it should
+change, sprites `schedule()` a callback for when their next change is due. `Timeline` keeps
+the callbacks in a heap keyed by due time, so each frame only touches the callbacks that
+are due; the rest cost nothing.
+
+A callback is called with the current time (in milliseconds) and returns how many
+milliseconds until it should be called again, or None to stop.
+'''
+
+import heapq
+from typing import Callable, List, Optional, Tuple
+
+import pygame
+import pygame.time
+
+AnimationCallback = Callable[[int], Optional[int]]
+
+
+class Animation:
+    '''
+    Handle for a scheduled callback, returned by `Timeline.schedule()`.
+    '''
+    __slots__ = ('callback', 'active')
+
+    def __init__(self, callback: AnimationCallback) -> None:
+        self.callback = callback
+        self.active = True
+
+    def cancel(self) -> None:
+        # Left in the heap and skipped when it comes up, so cancelling is O(1)
+        self.active = False
+
+
+_active: Optional['Timeline'] = None
+
+
+def schedule(callback: AnimationCallback, delay: int=0) -> Animation:
+    '''
+    Schedules `callback` on the active `Timeline` (the one `GameLoop` installed), creating
+    one if there is none yet.
+    '''
+    if _active is None:
+        Timeline().install()
+    return _active.schedule(callback, delay)
+
+
+class Timeline:
+    def __init__(self, time_func: Optional[Callable[[], int]]=None) -> None:
+        # Looked up on each call by default, so replays that patch get_ticks() apply here too
+        self.time_func = time_func if time_func is not None else lambda: pygame.time.get_ticks()
+        self.now = self.time_func()
+        self._heap: List[Tuple[int, int, Animation]] = []
+        self._seq = 0
+
+    def install(self) -> None:
+        '''
+        Makes this the timeline `schedule()` adds to.
+        '''
+        global _active
+        _active = self
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, callback: AnimationCallback, delay: int=0) -> Animation:
+        '''
+        Calls `callback` once `delay` milliseconds have passed (on the next `advance()`,
+        if `delay` is 0).
+        '''
+        anim = Animation(callback)
+        self._push(self.now + delay, anim)
+        return anim
+
+    def _push(self, due: int, anim: Animation) -> None:
+        # The sequence number keeps equal due times in FIFO order and Animations uncompared
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, anim))
+
+    def next_due(self) -> Optional[int]:
+        '''
+        When the next callback is due, or None if nothing is scheduled.
+        '''
+        while self._heap and not self._heap[0][2].active:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def advance(self, now: Optional[int]=None) -> int:
+        '''
+        Moves the clock to `now` (default: `time_func()`) and runs every callback that's due.
+        Returns how many ran.
+        '''
+        self.now = now = self.time_func() if now is None else now
+        heap = self._heap
+        ran = 0
+        while heap and heap[0][0] <= now:
+            due, _, anim = heapq.heappop(heap)
+            if not anim.active:
+                continue
+            delay = anim.callback(now)
+            ran += 1
+            if delay is None:
+                anim.active = False
+            else:
+                self._push(now + max(delay, 1), anim)
+        return ran
+
+    def rebase(self, now: int) -> None:
+        '''
+        Moves the clock to `now` without running anything, shifting every due time with it,
+        for when the time source changes (a replay starting).
+        '''
+        shift = now - self.now
+        self._heap = [(due + shift, seq, anim) for due, seq, anim in self._heap]
+        self.now = now
+
+    def clear(self) -> None:
+        for _, _, anim in self._heap:
+            anim.active = False
+        self._heap.clear()
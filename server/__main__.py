@@ -3,24 +3,42 @@ WWII Pacific Front Server - main.py
 (C) 2021 Jesus Trujillo, Delaney Siggia, Calvin Guela, Anthony Jaimes, Rocco Carrozza
 ---
 This module is the entry point for the game server.
+
+Each client keeps one websocket open and multiplexes logical channels (chat, lobby, game,
+telemetry) over it, like `WSConnection` in game/multiplayer.py, in the frames defined by
+game/frames.py. A channel's handler (a `WSServer`) is started the first time a frame
+arrives on it, usually the `join` a client sends when it connects. Malformed frames are
+skipped.
 '''
 
 import asyncio
-import json
-from typing import Type
+from typing import Dict, List, Type, Union
 
 import websockets
 
+from game.frames import DEFAULT_CHANNEL, decode_frame, encode_frame
+
+
 class WSServer:
-    def __init__(self, ws: websockets.WebSocketServer, path: str) -> None:
+    '''
+    Handles one channel of one client's connection.
+    '''
+    def __init__(
+        self,
+        ws: websockets.WebSocketServer,
+        path: str,
+        channel: str=DEFAULT_CHANNEL
+    ) -> None:
         self.ws = ws
         self.path = path
+        self.channel = channel
+        self.inbox: 'asyncio.Queue[dict]' = asyncio.Queue()
 
     async def send(self, msg_type: str, data: dict) -> None:
-        await self.ws.send(json.dumps({'type': msg_type, 'data': data}))
+        await self.ws.send(encode_frame(self.channel, msg_type, data))
 
     async def recv(self) -> dict:
-        return json.loads(await self.ws.recv())
+        return await self.inbox.get()
 
     async def server(self) -> None:
         pass
@@ -29,21 +47,53 @@ class WSServer:
 class WSServerRunner:
     def __init__(
         self,
-        ws_server_class: Type[WSServer],
+        channels: Union[Type[WSServer], Dict[str, Type[WSServer]]],
         host: str='0.0.0.0',
         port: int=8000
     ) -> None:
-        self.ws_server_class = ws_server_class
-        self.start_server = websockets.serve(self.server, host, port)
+        # A single handler class serves the default channel
+        if isinstance(channels, type):
+            channels = {DEFAULT_CHANNEL: channels}
+        self.channels = channels
+        self.host = host
+        self.port = port
+
+    async def server(self, ws: websockets.WebSocketServer, path: str='') -> None:
+        # Newer websockets versions pass only the connection
+        path = path or getattr(getattr(ws, 'request', None), 'path', '')
+        handlers: Dict[str, WSServer] = {}
+        tasks: List[asyncio.Task] = []
+        try:
+            async for raw in ws:
+                try:
+                    channel, msg = decode_frame(raw)
+                except ValueError as e:
+                    # One bad frame mustn't take down every channel on the socket
+                    print('Ignoring malformed frame:', e)
+                    continue
+                handler = handlers.get(channel)
+                if handler is None:
+                    handler_class = self.channels.get(channel)
+                    if handler_class is None:
+                        continue
+                    handler = handlers[channel] = handler_class(ws, path, channel)
+                    tasks.append(asyncio.ensure_future(handler.server()))
+                if msg.get('type') != 'join':
+                    handler.inbox.put_nowait(msg)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def serve_forever(self) -> None:
+        async with websockets.serve(self.server, self.host, self.port):
+            await asyncio.Future()
 
-    async def server(self, ws: websockets.WebSocketServer, path: str) -> None:
-        server_instance = self.ws_server_class(ws, path)
-        await server_instance.server()
-    
     def run(self) -> None:
         try:
-            asyncio.get_event_loop().run_until_complete(self.start_server)
-            asyncio.get_event_loop().run_forever()
+            asyncio.run(self.serve_forever())
         except KeyboardInterrupt:
             pass
 
@@ -56,6 +106,6 @@ class ChatServer(WSServer):
             await self.send('echo', recv)
 
 
-runner = WSServerRunner(ChatServer)
-
-runner.run()
+if __name__ == '__main__':
+    runner = WSServerRunner({'chat': ChatServer})
+    runner.run()